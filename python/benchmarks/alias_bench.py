@@ -0,0 +1,66 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times resolve_aliases on a synthetic locale in which n calendars alias the months of
+    the gregorian calendar, whose own widths and contexts are aliases in turn.
+    Usage: alias_bench.py [-n count]... """
+
+import os, sys, time
+from StringIO import StringIO
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+def makeldml(count):
+    months = "".join('<month type="{0}">m{0}</month>'.format(i) for i in range(1, 13))
+    res = ['<ldml><dates><calendars><calendar type="gregorian"><months>',
+           '<monthContext type="format">',
+           '<monthWidth type="abbreviated"><alias source="locale" path="../monthWidth[@type=\'wide\']"/></monthWidth>',
+           '<monthWidth type="narrow"><alias source="locale" path="../../monthContext[@type=\'stand-alone\']/monthWidth[@type=\'narrow\']"/></monthWidth>',
+           '<monthWidth type="wide">' + months + '</monthWidth></monthContext>',
+           '<monthContext type="stand-alone">',
+           '<monthWidth type="abbreviated"><alias source="locale" path="../../monthContext[@type=\'format\']/monthWidth[@type=\'abbreviated\']"/></monthWidth>',
+           '<monthWidth type="narrow">' + months + '</monthWidth>',
+           '<monthWidth type="wide"><alias source="locale" path="../../monthContext[@type=\'format\']/monthWidth[@type=\'wide\']"/></monthWidth>',
+           '</monthContext></months></calendar>']
+    for i in range(count):
+        res.append('<calendar type="c{:05d}"><months><alias source="locale" path="../../calendar[@type=\'gregorian\']/months"/></months></calendar>'.format(i))
+    res.append('</calendars></dates></ldml>')
+    return Ldml(StringIO("".join(res)))
+
+parser = ArgumentParser()
+parser.add_argument('-n','--count',type=int,action='append',help='Number of aliasing calendars (repeatable) [250 500 1000 2000]')
+args = parser.parse_args()
+
+for n in (args.count or [250, 500, 1000, 2000]):
+    l = makeldml(n)
+    t = time.time()
+    l.resolve_aliases()
+    t = time.time() - t
+    months = sum(1 for e in l.root.iter('month'))
+    print "{:>6} aliases: {:6.3f}s, {:7.1f}us per alias, {} months".format(n, t, t * 1e6 / n, months)
@@ -0,0 +1,67 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times overlay and difference between two synthetic locales whose languages element
+    has many siblings, half of them shared, a tenth of those with different values.
+    Usage: align_bench.py [-n count]... """
+
+import os, sys, time
+from StringIO import StringIO
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+def makeldml(start, count, changed=()):
+    res = ['<ldml><localeDisplayNames><languages>']
+    for i in range(start, start + count):
+        res.append('<language type="x{0:05d}">{1}{0}</language>'.format(i, "y" if i in changed else "x"))
+    res.append('</languages></localeDisplayNames></ldml>')
+    return Ldml(StringIO("".join(res)))
+
+def timeit(fn):
+    t = time.time()
+    fn()
+    return time.time() - t
+
+def run(count):
+    half = count // 2
+    changed = set(range(half, count, 10))
+    this = makeldml(0, count)
+    other = makeldml(half, count, changed)
+    tover = timeit(lambda: this.overlay(other, copy=True))
+    this = makeldml(0, count)
+    tdiff = timeit(lambda: this.difference(other))
+    left = len(this.root.find('localeDisplayNames/languages'))
+    print "{:>6} siblings: overlay {:6.3f}s, difference {:6.3f}s ({} left)".format(count, tover, tdiff, left)
+
+parser = ArgumentParser()
+parser.add_argument('-n','--count',type=int,action='append',help='Number of siblings (repeatable) [2500 5000 10000 20000]')
+args = parser.parse_args()
+
+for n in (args.count or [2500, 5000, 10000, 20000]):
+    run(n)
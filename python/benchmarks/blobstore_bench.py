@@ -0,0 +1,105 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Flattens locales and stores them as xml files and in a BlobStore, comparing the bytes
+    written, the disk space used, and the time to write them and to read them back.
+    Usage: blobstore_bench.py [-n count] [-A] [indir] """
+
+import os, sys, time, codecs, shutil, tempfile
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale
+    from sldr.blobstore import BlobStore
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale
+    from sldr.blobstore import BlobStore
+
+def usage(d):
+    """Returns the bytes in the files under d and the space they take in 4k blocks"""
+    res = [0, 0]
+    for (dp, dn, fn) in os.walk(d):
+        for f in fn:
+            s = os.path.getsize(os.path.join(dp, f))
+            res[0] += s
+            res[1] += (s + 4095) // 4096 * 4096
+    return res
+
+def writexml(l, c):
+    with codecs.open(os.path.join(tmpdir, 'xml', l + '.xml'), 'w', encoding='utf-8') as fh:
+        c.serialize_xml(fh.write, topns=False)
+
+def readxml(l):
+    return Ldml(os.path.join(tmpdir, 'xml', l + '.xml'))
+
+def writeblobs(l, c):
+    store.save(c, os.path.join(tmpdir, 'refs', l + '.json'))
+
+def readblobs(l):
+    return reader.load(os.path.join(tmpdir, 'refs', l + '.json'))
+
+def run(name, writer, reader, dirs):
+    t = time.time()
+    for (l, c) in trees:
+        writer(l, c)
+    w = time.time() - t
+    t = time.time()
+    for (l, c) in trees:
+        reader(l)
+    r = time.time() - t
+    (size, disk) = map(sum, zip(*[usage(os.path.join(tmpdir, d)) for d in dirs]))
+    print "{:>5}: {:8.1f}MB written, {:8.1f}MB on disk, write {:6.2f}s, read {:6.2f}s".format(name,
+            size / 1048576., disk / 1048576., w, r)
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=100,help='Number of locales to flatten [100]')
+parser.add_argument('-A','--antialias',action='store_true',help='Resolve aliases, as for serving')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(f[:-4] for f in fn if f.endswith('.xml'))
+step = max(1, len(files) // args.count)
+locales = sorted(files)[::step][:args.count]
+ancestors = FlatAncestors([args.indir])
+trees = []
+for l in locales:
+    c = flattenlocale(l, dirs=[args.indir], flattencollation=True, ancestors=ancestors)
+    if args.antialias:
+        c.resolve_aliases()
+    c.normalise()
+    trees.append((l, c))
+
+tmpdir = tempfile.mkdtemp()
+try:
+    for d in ('xml', 'refs'):
+        os.makedirs(os.path.join(tmpdir, d))
+    store = BlobStore(os.path.join(tmpdir, 'blobs'))
+    reader = BlobStore(os.path.join(tmpdir, 'blobs'))
+    print "{} locales".format(len(trees))
+    run("xml", writexml, readxml, ('xml',))
+    run("blobs", writeblobs, readblobs, ('refs', 'blobs'))
+finally:
+    shutil.rmtree(tmpdir)
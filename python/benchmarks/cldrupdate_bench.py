@@ -0,0 +1,105 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Times importing CLDR data through cldrimport, ldmlflatten -a and ldmlflatten -a -r, each
+    writing a directory for the next, and through cldrupdate, which does it all in memory,
+    and checks both give the same files. Lacking a CLDR checkout, it makes a CLDR shaped
+    common directory from the sldr files of the given languages, splitting collations and
+    segmentations out into their own subdirectories.
+    Usage: cldrupdate_bench.py [-s] [-l langs] [indir] """
+
+import os, sys, time, subprocess, tempfile, shutil, filecmp
+from argparse import ArgumentParser
+from xml.etree import ElementTree as et
+
+scripts = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+
+def makecldr(common):
+    et.register_namespace('sil', 'urn://www.sil.org/ldml/0.1')
+    for s in ('main', 'collation', 'segments'):
+        os.makedirs(os.path.join(common, s))
+    for (dp, dn, fn) in os.walk(args.indir):
+        for f in fn:
+            if not f.endswith('.xml') or f[:-4].split('_')[0] not in langs:
+                continue
+            tree = et.parse(os.path.join(dp, f))
+            root = tree.getroot()
+            for (s, tag) in (('collation', 'collations'), ('segments', 'segmentations')):
+                e = root.find(tag)
+                if e is None:
+                    continue
+                r = et.Element('ldml')
+                r.append(root.find('identity'))
+                root.remove(e)
+                r.append(e)
+                et.ElementTree(r).write(os.path.join(common, s, f), encoding='utf-8', xml_declaration=True)
+            tree.write(os.path.join(common, 'main', f), encoding='utf-8', xml_declaration=True)
+
+def script(name, *a):
+    subprocess.check_call([sys.executable, os.path.join(scripts, name)] + (['-s'] if args.single else []) + list(a))
+
+def staged(outdir):
+    data = os.path.join(tmpdir, 'cldrdata')
+    flat = os.path.join(tmpdir, 'cldrflat')
+    os.makedirs(data)
+    os.makedirs(flat)
+    script('cldrimport', common, data)
+    script('ldmlflatten', '-i', data, '-o', flat, '-a')
+    script('ldmlflatten', '-i', flat, '-o', outdir, '-a', '-r')
+
+def inmemory(outdir):
+    script('cldrupdate', common, outdir)
+
+def run(name, fn):
+    outdir = os.path.join(tmpdir, name)
+    t = time.time()
+    fn(outdir)
+    t = time.time() - t
+    n = sum(len(fn) for (dp, dn, fn) in os.walk(outdir))
+    print "{:>9}: {:4} locales: {:6.2f}s, {:6.1f}ms per locale".format(name, n, t, t * 1000. / n)
+    return outdir
+
+def same(a, b):
+    for (dp, dn, fn) in os.walk(a):
+        for f in fn:
+            g = os.path.join(b, os.path.relpath(os.path.join(dp, f), a))
+            if not os.path.exists(g) or not filecmp.cmp(os.path.join(dp, f), g, shallow=False):
+                return False
+    return True
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-l','--langs',default='root,en,fr,es,sr,zh,ar,de,pt,ja,bs,az,yue,ca',help='Comma separated languages to import [root,en,fr,es,sr,zh,ar,de,pt,ja,bs,az,yue,ca]')
+parser.add_argument('-s','--single',action='store_true',help='Turn off multiprocessing')
+args = parser.parse_args()
+
+langs = set(args.langs.split(','))
+tmpdir = tempfile.mkdtemp()
+try:
+    common = os.path.join(tmpdir, 'common')
+    makecldr(common)
+    a = run("staged", staged)
+    b = run("in memory", inmemory)
+    print "Results {}".format("match" if same(a, b) and same(b, a) else "differ")
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,60 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times building and then looking up many siblings under one parent through ensure_path
+    and find, to show how the cost grows with the number of siblings.
+    Usage: ensurepath_bench.py [-n count]... """
+
+import os, sys, time
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+def run(count):
+    l = Ldml(None)
+    paths = ['localeDisplayNames/languages/language[@type="x{:05d}"]'.format(i) for i in range(count)]
+    t = time.time()
+    for i, p in enumerate(paths):
+        l.ensure_path(p)[0].text = str(i)
+    build = time.time() - t
+    t = time.time()
+    for p in paths:
+        l.ensure_path(p)
+    again = time.time() - t
+    t = time.time()
+    for p in paths:
+        l.find(p)
+    find = time.time() - t
+    print "{:>6} siblings: build {:6.3f}s, ensure existing {:6.3f}s, find {:6.3f}s".format(count, build, again, find)
+
+parser = ArgumentParser()
+parser.add_argument('-n','--count',type=int,action='append',help='Number of siblings (repeatable) [1000 2000 4000 8000]')
+args = parser.parse_args()
+
+for n in (args.count or [1000, 2000, 4000, 8000]):
+    run(n)
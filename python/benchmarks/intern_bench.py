@@ -0,0 +1,88 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Measures the memory used to hold many flattened locales at once, with and without
+    interning their subtrees. Each mode runs in its own process.
+    Usage: intern_bench.py [-n count] flatdir (the output of ldmlflatten -o flatdir) """
+
+import os, sys, time, resource
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml, Interner
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, Interner
+
+
+def rss():
+    """Current resident set size in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for l in f:
+                if l.startswith('VmRSS:'):
+                    return int(l.split()[1]) / 1024.
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+def run(files, intern):
+    interner = Interner() if intern else None
+    start = rss()
+    t = time.time()
+    locales = []
+    for f in files:
+        l = Ldml(f)
+        if interner is not None:
+            l.intern(interner)
+        locales.append(l)
+    t = time.time() - t
+    res = "{:>10}: {:7.1f} MB for {} locales, {:5.1f} kB per locale, {:.1f}s".format(
+            "interned" if intern else "plain", rss() - start, len(locales),
+            (rss() - start) * 1024. / len(locales), t)
+    if interner is not None:
+        res += ", {} shared subtrees".format(len(interner.nodes))
+    return res
+
+parser = ArgumentParser()
+parser.add_argument('flatdir',help='Directory tree of flattened ldml files')
+parser.add_argument('-n','--count',type=int,default=200,help='Number of locales to load [200]')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.flatdir):
+    files.extend(os.path.join(dp, f) for f in fn if f.endswith('.xml'))
+files = sorted(files)[:args.count]
+Ldml.ReadMetadata()
+
+for intern in (False, True):
+    (r, w) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        os.write(w, run(files, intern))
+        os._exit(0)
+    os.close(w)
+    print os.read(r, 4096)
+    os.waitpid(pid, 0)
@@ -0,0 +1,69 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Measures the memory used to hold many locales at once, per locale and per element.
+    Usage: memory_bench.py [-n count] [dir] (default the whole sldr tree) """
+
+import os, sys, time, resource
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+
+def rss():
+    """Current resident set size in kB"""
+    try:
+        with open('/proc/self/status') as f:
+            for l in f:
+                if l.startswith('VmRSS:'):
+                    return int(l.split()[1])
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=sldrdir,help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,help='Only load this many files')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(os.path.join(dp, f) for f in fn if f.endswith('.xml'))
+files = sorted(files)[:args.count]
+Ldml.ReadMetadata()
+
+start = rss()
+t = time.time()
+locales = [Ldml(f) for f in files]
+t = time.time() - t
+used = rss() - start
+elements = sum(sum(1 for e in l.root.iter()) for l in locales)
+print "{} locales, {} elements: {:.1f} MB, {:.1f} kB per locale, {:.0f} bytes per element, {:.1f}s".format(
+        len(locales), elements, used / 1024., float(used) / len(locales), used * 1024. / elements, t)
@@ -0,0 +1,68 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times reading every ldml file in a directory tree into an Ldml, normalised and hashed,
+    and separately the files with the most comments.
+    Usage: parse_bench.py [-n count] [indir] """
+
+import os, sys, time
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+def run(name, files):
+    size = sum(os.path.getsize(f) for f in files)
+    count = 0
+    t = time.time()
+    for f in files:
+        l = Ldml(f)
+        l.root.contentHash
+        count += sum(1 for e in l.root.iter())
+    t = time.time() - t
+    print "{:>9}: {:4} files, {:6.1f} MB, {:7} elements: {:6.2f}s, {:5.2f}ms per file, {:5.2f} MB/s".format(
+            name, len(files), size / 1048576., count, t, t * 1000. / len(files), size / 1048576. / t)
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=0,help='Only read this many files [all]')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(os.path.join(dp, f) for f in fn if f.endswith('.xml'))
+files = sorted(files)
+if args.count:
+    files = files[:args.count]
+Ldml.ReadMetadata()
+
+comments = {}
+for f in files:
+    with open(f) as fh:
+        comments[f] = fh.read().count('<!--')
+run("all", files)
+run("comments", sorted(files, key=lambda f: -comments[f])[:max(1, len(files) // 20)])
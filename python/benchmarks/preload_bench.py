@@ -0,0 +1,87 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Times flattening locales in a Pool, as ldmlflatten does, with each worker reading the schema,
+    supplemental data and common ancestors itself, and with the parent loading them before
+    forking. Reports the elapsed time, the processor time of all processes together, and the
+    most memory any worker holds privately, rather than sharing with the parent.
+    Each way runs in a fresh interpreter, since the tables are kept in the Ldml class.
+    Usage: preload_bench.py [-n count] [-w workers] [indir] """
+
+import os, sys, time, subprocess
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+try:
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale
+
+def private():
+    """Returns the memory this process does not share with any other, in kB"""
+    res = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for l in f:
+            if l.startswith(('Private_Clean:', 'Private_Dirty:')):
+                res += int(l.split()[1])
+    return res
+
+def doit(l):
+    curr = flattenlocale(l, dirs=[args.indir], flattencollation=True, ancestors=ancestors)
+    curr.normalise()
+    return (os.getpid(), private())
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=200,help='Number of locales to flatten [200]')
+parser.add_argument('-w','--workers',type=int,default=4,help='Number of worker processes [4]')
+parser.add_argument('--preload',choices=('no', 'yes'),help='Run one way, in this process')
+args = parser.parse_args()
+
+if args.preload is None:
+    for p in ('no', 'yes'):
+        subprocess.check_call([sys.executable, __file__, '-n', str(args.count), '-w', str(args.workers), '--preload', p, args.indir])
+    sys.exit(0)
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(f[:-4] for f in fn if f.endswith('.xml'))
+locales = sorted(files)[:args.count]
+ancestors = FlatAncestors([args.indir])
+
+t = time.time()
+if args.preload == 'yes':
+    Ldml.preload(supplemental=True)
+    ancestors.preload(locales)
+pool = Pool(args.workers)
+res = pool.map(doit, locales)
+pool.close()
+pool.join()
+t = time.time() - t
+cpu = sum(os.times()[:4])
+mem = {}
+for (pid, m) in res:
+    mem[pid] = max(m, mem.get(pid, 0))
+print "preload {:>3}: {:4} locales, {} workers: {:6.2f}s elapsed, {:6.2f}s processor, {:6.1f}MB most private to a worker".format(
+        args.preload, len(locales), args.workers, t, cpu, max(mem.values()) / 1024.)
@@ -0,0 +1,70 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Times finding the last revision of every ldml file with one git log per file, as
+    ldmlflatten -g used to, and through a RevisionIndex built from one walk of the log,
+    and checks both give the same result.
+    Usage: revisions_bench.py [-n count] [indir] """
+
+import os, sys, time, subprocess
+from argparse import ArgumentParser
+
+try:
+    from sldr.revisions import RevisionIndex
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.revisions import RevisionIndex
+
+def perfile():
+    res = []
+    for f in files:
+        clog = subprocess.check_output(['git', 'log', '-n', '1', '--pretty=format:%H%n%ci', f], cwd=args.indir)
+        res.append(tuple(clog.split("\n")) if clog else None)
+    return res
+
+def indexed():
+    revs = RevisionIndex(args.indir)
+    return [revs.lookup(f) for f in files]
+
+def run(name, fn):
+    t = time.time()
+    res = fn()
+    t = time.time() - t
+    print "{:>8}: {:4} files: {:6.2f}s, {:6.2f}ms per file".format(name, len(files), t, t * 1000. / len(files))
+    return res
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=0,help='Number of files to look up, 0 for all [0]')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(os.path.abspath(os.path.join(dp, f)) for f in fn if f.endswith('.xml'))
+files.sort()
+if args.count:
+    files = files[:args.count]
+
+a = run("per file", perfile)
+b = run("indexed", indexed)
+print "Results {}".format("match" if a == b else "differ")
@@ -0,0 +1,66 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times scanning a corpus of ldml files for one thing each: the number of top level
+    elements, as ltdb2alltags does, and the identity language, as get_script does. Each is
+    timed reading whole files and reading them lazily or only the needed section.
+    Usage: section_bench.py [-n count] [indir] """
+
+import os, sys, time
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+def toplevel(f, **kw):
+    return len(Ldml(f, **kw).root)
+
+def language(f, **kw):
+    l = Ldml(f, **kw).root.find('identity/language')
+    return l.get('type') if l is not None else None
+
+def run(name, fn, files, **kw):
+    t = time.time()
+    res = [fn(f, **kw) for f in files]
+    t = time.time() - t
+    print "{:>8} {:>20}: {:6.2f}s, {:5.2f}ms per file".format(name, kw.keys()[0] if len(kw) else "full", t, t * 1000. / len(files))
+    return res
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=500,help='Number of files to read [500]')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(os.path.join(dp, f) for f in fn if f.endswith('.xml'))
+files = sorted(files)[:args.count]
+Ldml.ReadMetadata()
+
+for name, fn, kw in (('toplevel', toplevel, {'lazy' : True}), ('language', language, {'sections' : ['identity']})):
+    if run(name, fn, files) != run(name, fn, files, **kw):
+        print "Results differ"
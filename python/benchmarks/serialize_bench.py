@@ -0,0 +1,145 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" Times Ldml.serialize_xml against the previous write-as-you-go serializer,
+    checking that both give the same output.
+    Usage: serialize_bench.py [-n repeats] [files...] (default el, es and en from sldr) """
+
+import os, sys, re, time
+from StringIO import StringIO
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml, ETWriter, _elementprotect, _attribprotect
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, ETWriter, _elementprotect, _attribprotect
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+
+class LegacyLdml(Ldml):
+    """The serializer as it was: one write() per fragment, cmp sorting, alternates inserted into the tree"""
+
+    def _protect(self, txt, base=_attribprotect):
+        return re.sub(ur'['+ur"".join(base.keys())+ur"]", lambda m: base[m.group(0)], txt)
+
+    def _legacy(self, write, base = None, indent = '', topns = True, namespaces = {}):
+        if base is None:
+            base = self.root
+            write('<?xml version="1.0" encoding="utf-8"?>\n')
+        (tag, q, ns) = self._localisens(base.tag)
+        localattribs = {}
+        if ns and ns not in namespaces:
+            namespaces[ns] = q
+            localattribs['xmlns:'+q] = ns
+        if topns:
+            if base == self.root:
+                for n,q in self.namespaces.items():
+                    localattribs['xmlns:'+q] = n
+                    namespaces[n] = q
+        else:
+            for c in base:
+                (lt, lq, lns) = self._localisens(c.tag)
+                if lns and lns not in namespaces:
+                    namespaces[lns] = q
+                    localattribs['xmlns:'+lq] = lns
+        self._nsprotectattribs(getattr(base, 'attrib', None), localattribs, namespaces)
+        for c in getattr(base, 'comments', []):
+            write(u'{}<!--{}-->\n'.format(indent, c))
+        write(u'{}<{}'.format(indent, tag))
+        if len(localattribs):
+            for k in self._sortedattrs(base, localattribs):
+                write(u' {}="{}"'.format(self._localisens(k)[0], self._protect(localattribs[k])))
+        if len(base):
+            write('>\n')
+            for b in base:
+                self.serialize_xml(write, base=b, indent=indent + self.indent, topns=topns, namespaces=namespaces.copy())
+            write('{}</{}>\n'.format(indent, tag))
+        elif base.text:
+            if tag not in self.takesCData:
+                t = self._protect(base.text.replace('\n', '\n' + indent), base=_elementprotect)
+            else:
+                t = "<![CDATA[\n\t" + indent + base.text.replace('\n', '\n\t' + indent) + "\n" + indent + "]]>"
+            write(u'>{}</{}>\n'.format(t, tag))
+        else:
+            write('/>\n')
+        for c in getattr(base, 'commentsafter', []):
+            write(u'{}<!--{}-->\n'.format(indent, c))
+
+    def serialize_xml(self, write, base = None, indent = '', topns = True, namespaces = {}):
+        if self.useDrafts:
+            n = base if base is not None else self.root
+            draft = n.get('draft', '')
+            if draft and (len(n) or draft == self.default_draft):
+                del n.attrib['draft']
+            offset = 0
+            alt = n.get('alt', '')
+            for (i, c) in enumerate(list(n)):
+                if not hasattr(c, 'alternates'): continue
+                for a in sorted(c.alternates.keys()):
+                    c.alternates[a].set('alt', (alt+"-"+a if alt else a))
+                    offset += 1
+                    n.insert(i + offset, c.alternates[a])
+                    c.alternates[a].tempnode = True
+        self._legacy(write, base, indent, topns, namespaces)
+        if self.useDrafts:
+            n = base if base is not None else self.root
+            for c in list(n):
+                if hasattr(c, 'tempnode') and c.tempnode:
+                    n.remove(c)
+
+
+def timeit(fn, repeats):
+    best = None
+    for i in range(repeats):
+        start = time.time()
+        fn()
+        t = time.time() - start
+        if best is None or t < best:
+            best = t
+    return best
+
+def run(ldml, method):
+    res = StringIO()
+    method(ldml, res.write)
+    return res.getvalue()
+
+parser = ArgumentParser()
+parser.add_argument('files', nargs='*', help='LDML files to serialize')
+parser.add_argument('-n', '--repeats', type=int, default=5, help='Take the best of this many runs')
+args = parser.parse_args()
+if not len(args.files):
+    args.files = [os.path.join(sldrdir, 'e', f) for f in ('el.xml', 'es.xml', 'en.xml')]
+
+print "{:<12} {:>10} {:>10} {:>8}".format("file", "legacy(s)", "new(s)", "speedup")
+for f in args.files:
+    old = LegacyLdml(f)
+    new = Ldml(f)
+    if run(old, LegacyLdml.serialize_xml) != run(new, Ldml.serialize_xml):
+        print "Output differs for " + f
+        sys.exit(1)
+    told = timeit(lambda: run(old, LegacyLdml.serialize_xml), args.repeats)
+    tnew = timeit(lambda: run(new, Ldml.serialize_xml), args.repeats)
+    print "{:<12} {:>10.4f} {:>10.4f} {:>7.1f}x".format(os.path.basename(f), told, tnew, told / tnew)
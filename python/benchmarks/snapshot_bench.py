@@ -0,0 +1,76 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Times copying a locale so that the copy can be changed without changing the original,
+    by deep copy and by snapshot, and counts the elements each copies to change one value.
+    Usage: snapshot_bench.py [-n count] [indir] """
+
+import os, sys, time
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml
+
+path = 'localeDisplayNames/languages/language[@type="x-bench"]'
+
+def private(l):
+    """Number of elements in l that are not shared"""
+    return sum(1 for e in l.root.iter() if not e.frozen)
+
+def run(name, locales, copier):
+    copies = []
+    t = time.time()
+    for l in locales:
+        c = copier(l)
+        c.ensure_path(path)[0].text = "bench"
+        copies.append(c)
+    t = time.time() - t
+    copied = sum(private(c) for c in copies)
+    print "{:>9}: {:4} locales: {:6.2f}s, {:6.2f}ms per locale, {:7.1f} elements copied per change".format(
+            name, len(locales), t, t * 1000. / len(locales), copied / float(len(locales)))
+
+def deepcopy(l):
+    res = Ldml(None)
+    res.root = l.copytree(l.root)
+    res.root.document = res
+    return res
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=200,help='Number of locales to load [200]')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(os.path.join(dp, f) for f in fn if f.endswith('.xml'))
+files = sorted(files)[:args.count]
+Ldml.ReadMetadata()
+
+locales = [Ldml(f) for f in files]
+print "{} locales, {} elements".format(len(locales), sum(sum(1 for e in l.root.iter()) for l in locales))
+run("deepcopy", locales, deepcopy)
+run("snapshot", locales, lambda l: l.snapshot())
+run("again", locales, lambda l: l.snapshot())
@@ -0,0 +1,95 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+""" Times making the flat, aliases resolved, and copied outputs of the serving recipe, reading
+    each locale and asking git for its revision once per output and once for both, through
+    snapshots, and checks both give the same result.
+    Usage: variant_bench.py [-n count] [-g] [indir] """
+
+import os, sys, time, subprocess
+from argparse import ArgumentParser
+
+try:
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale, findldml
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, FlatAncestors, flattenlocale, findldml
+
+def serialize(l):
+    res = []
+    l.serialize_xml(res.append)
+    return u"".join(res)
+
+def revid(fname):
+    if not args.git:
+        return "bench"
+    return subprocess.check_output(['git', 'log', '-n', '1', '--pretty=format:%H', fname])
+
+def output(base, fname, action, antialias, rev):
+    curr = flattenlocale(base, fname=fname, dirs=[args.indir], rev=action, flattencollation=True, ancestors=ancestors)
+    curr.add_silidentity(revid = rev)
+    if antialias:
+        curr.resolve_aliases()
+    curr.normalise()
+    return serialize(curr)
+
+def separate(l):
+    res = []
+    for (action, antialias) in variants:
+        f = findldml(l, [args.indir])
+        res.append(output(Ldml(f), l, action, antialias, revid(f)))
+    return res
+
+def once(l):
+    f = findldml(l, [args.indir])
+    base = Ldml(f)
+    rev = revid(f)
+    return [output(base.snapshot() if i < len(variants) - 1 else base, l, action, antialias, rev)
+                for (i, (action, antialias)) in enumerate(variants)]
+
+def run(name, fn):
+    t = time.time()
+    res = [fn(l) for l in locales]
+    t = time.time() - t
+    print "{:>8}: {:4} locales: {:6.2f}s, {:6.1f}ms per locale".format(name, len(locales), t, t * 1000. / len(locales))
+    return res
+
+parser = ArgumentParser()
+parser.add_argument('indir',nargs='?',default=os.path.join(os.path.dirname(__file__), '..', '..', 'sldr'),help='Directory tree of ldml files [sldr]')
+parser.add_argument('-n','--count',type=int,default=40,help='Number of locales to output [40]')
+parser.add_argument('-g','--git',action='store_true',help='Get revid from last change to each file, as ldmlflatten -g does')
+args = parser.parse_args()
+
+files = []
+for (dp, dn, fn) in os.walk(args.indir):
+    files.extend(f[:-4] for f in fn if f.endswith('.xml'))
+locales = sorted(files)[:args.count]
+variants = (('f', True), ('c', False))
+Ldml.ReadMetadata()
+ancestors = FlatAncestors([args.indir])
+for l in locales:       # fill the memo and load the supplemental data before timing
+    flattenlocale(l, dirs=[args.indir], ancestors=ancestors)
+
+a = run("separate", separate)
+b = run("once", once)
+print "Results {}".format("match" if a == b else "differ")
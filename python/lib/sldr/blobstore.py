@@ -0,0 +1,154 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, json, hashlib, weakref
+from ldml import Ldml, LdmlElement, _share, _ascii
+
+_quote = json.encoder.encode_basestring
+
+class BlobStore(object):
+    """ Content addressed store of Ldml trees, such as the outputs of flattening. Each subtree
+        whose encoding takes at least minsize bytes is written once, as a blob named by the
+        sha1 of that encoding, and each tree is saved as a small file of references to the
+        blobs of its largest subtrees. Trees holding the same blocks, inherited from the same
+        ancestors, thus share them on disk. Blobs are never changed once written, and are
+        written atomically, so pool workers can share a store. Trees loaded through the same
+        BlobStore share one frozen instance of each blob, as an Interner would give them. """
+
+    version = 1
+
+    def __init__(self, path, minsize=1024):
+        self.path = path
+        self.minsize = minsize
+        self.known = set()      # blobs known to be in the store
+        self.encoded = weakref.WeakKeyDictionary()     # json of frozen elements, which never change
+        self.nodes = weakref.WeakValueDictionary()
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError:     # another worker got there first
+                pass
+
+    def blobfile(self, key):
+        return os.path.join(self.path, key[:2], key[2:] + '.json')
+
+    def save(self, ldml, fname):
+        """Writes the normalised tree of ldml to fname, putting its large subtrees in the store"""
+        res = u'{{"version":{},"usedrafts":{},"namespaces":{},"root":{}}}'.format(self.version,
+                u'true' if ldml.useDrafts else u'false', _jsondict(ldml.namespaces),
+                self._encode(ldml.root, True))
+        _writefile(fname, res)
+
+    def _encode(self, e, inline=False):
+        """ Returns the json for e, as [tag, attrib, text, children] with an optional dict of
+            comments and alternates, or for a large subtree the quoted name of its blob """
+        if e.frozen:
+            res = self.encoded.get(e, None)
+            if res is not None:
+                return res
+        res = [_jsonstr(e.tag), _jsondict(e.attrib), _jsonstr(e.text),
+               u'[' + u','.join(self._encode(c) for c in e) + u']']
+        extra = []
+        for a in ('comments', 'commentsafter'):
+            v = getattr(e, a, None)
+            if v:
+                extra.append(u'"{}":[{}]'.format(a, u','.join(_jsonstr(c) for c in v)))
+        alts = getattr(e, 'alternates', None)
+        if alts:
+            extra.append(u'"alternates":{' + u','.join(u'{}:{}'.format(_jsonstr(k), self._encode(alts[k]))
+                                                        for k in sorted(alts)) + u'}')
+        if len(extra):
+            res.append(u'{' + u','.join(extra) + u'}')
+        res = u'[' + u','.join(res) + u']'
+        if not inline and len(res) >= self.minsize:
+            key = hashlib.sha1(res.encode('utf-8')).hexdigest()
+            if key not in self.known:
+                bname = self.blobfile(key)
+                if not os.path.exists(bname):
+                    _writefile(bname, res)
+                self.known.add(key)
+            res = u'"' + key + u'"'
+        if e.frozen:
+            self.encoded[e] = res
+        return res
+
+    def load(self, fname):
+        """Returns the Ldml saved in fname, reading any blobs not already loaded"""
+        with open(fname) as fh:
+            data = json.load(fh)
+        if data.get('version') != self.version:
+            raise ValueError("{} is not from a version {} BlobStore".format(fname, self.version))
+        res = Ldml(None, usedrafts=data['usedrafts'])
+        res.namespaces.update((_ascii(k), _ascii(v)) for k, v in data['namespaces'].items())
+        res.root = self._decode(data['root'], res, None)
+        res.analyse()
+        return res
+
+    def _decode(self, t, doc, parent):
+        if isinstance(t, basestring):
+            e = self.nodes.get(t, None)
+            if e is None:
+                with open(self.blobfile(t)) as fh:
+                    e = self._decode(json.load(fh), doc, None)
+                _share(e)
+                self.nodes[t] = e
+            return e
+        (tag, attrib, text, children) = t[:4]
+        e = LdmlElement(_ascii(tag), dict((_ascii(k), _ascii(v)) for k, v in attrib.items()))
+        e.text = _ascii(text) if text is not None else None
+        e.document = doc
+        if parent is not None:
+            e.parent = parent
+        if len(t) > 4:
+            extra = t[4]
+            for a in ('comments', 'commentsafter'):
+                if a in extra:
+                    setattr(e, a, [_ascii(c) for c in extra[a]])
+            if 'alternates' in extra:
+                e.alternates = dict((_ascii(k), self._decode(v, doc, parent)) for k, v in extra['alternates'].items())
+        e[:] = [self._decode(c, doc, e) for c in children]
+        e.normalised = doc.useDrafts
+        return e
+
+
+def _jsonstr(s):
+    """Returns s as a json string, leaving non ascii characters as they are"""
+    return _quote(s) if s is not None else u'null'
+
+def _jsondict(d):
+    """Returns a dict of strings as a json object, with its keys sorted"""
+    return u'{' + u','.join(_quote(k) + u':' + _quote(d[k]) for k in sorted(d)) + u'}'
+
+def _writefile(fname, text):
+    """Writes text to fname in utf-8, atomically"""
+    d = os.path.dirname(fname)
+    if d and not os.path.exists(d):
+        try:
+            os.makedirs(d)
+        except OSError:     # another worker got there first
+            pass
+    tmpname = "{}.{}.tmp".format(fname, os.getpid())
+    with open(tmpname, 'wb') as fh:
+        fh.write(text.encode('utf-8'))
+    os.rename(tmpname, fname)
@@ -0,0 +1,81 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os
+from xml.etree import ElementTree as et
+from ldml import Ldml
+
+subdirs = ('main', 'collation', 'casing', 'segments')
+
+def cldrlocales(indir):
+    """Returns the set of locales with a file in any of the subdirs of a CLDR common directory"""
+    res = set()
+    for s in subdirs:
+        if not os.path.exists(os.path.join(indir, s)):
+            continue
+        for l in os.listdir(os.path.join(indir, s)):
+            if l[-4:].lower() == '.xml':
+                res.add(l[:-4])
+    return res
+
+def cldrfiles(lname, indir):
+    """Returns the files for a locale in the subdirs of a CLDR common directory"""
+    return [f for f in (os.path.join(indir, s, lname + '.xml') for s in subdirs) if os.path.exists(f)]
+
+def importlocale(lname, indir, seed=False, revisions=None):
+    """ Returns an Ldml for a locale from a CLDR common (or seed) directory, with the files
+        for it in each of the subdirs overlaid, or None if there are none. revisions is an
+        optional RevisionIndex of the CLDR repository, to record the last change to them. """
+    curr = None
+    allfiles = cldrfiles(lname, indir)
+    for f in allfiles:
+        l = Ldml(f)
+        if curr is not None:
+            curr.overlay(l)
+        else:
+            curr = l
+    if curr is None:
+        return None
+    curr.normalise()
+    if seed:
+        curr.add_silidentity(draft = 'unconfirmed', source = 'cldrseed')
+    else:
+        curr.add_silidentity(draft = 'approved', source = 'cldr')
+    if revisions is not None:
+        r = revisions.last(allfiles)
+        if r is not None:
+            setrevision(curr, *r)
+    return curr
+
+def setrevision(l, rev, date):
+    """Records a revision and its date in identity/version and identity/generation"""
+    i = l.root.find("identity")
+    r = i.find("version")
+    if r is None:
+        r = et.SubElement(i, "version")
+    r.set('number', "$Revision: {} $".format(rev))
+    d = i.find("generation")
+    if d is None:
+        d = et.SubElement(i, "generation")
+    d.set("date", "$Date: {} $".format(date))
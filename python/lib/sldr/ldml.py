@@ -25,7 +25,10 @@
 from xml.etree import ElementTree as et
 from xml.etree import ElementPath as ep
 import xml.parsers.expat
-import re, os, codecs
+import re, os, sys, codecs, copy, hashlib, struct, weakref, json
+from collections import OrderedDict
+import cPickle as pickle
+from cStringIO import StringIO
 
 _elementprotect = {
     '&': '&amp;',
@@ -34,12 +37,24 @@ _elementprotect = {
 _attribprotect = dict(_elementprotect)
 _attribprotect['"'] = '&quot;'
 
+class _attrKeys(dict):
+    """Maps attribute names to their sort keys for one element, filling in as needed"""
+    def __init__(self, order, maxAts):
+        self.order = order
+        self.maxAts = maxAts
+
+    def __missing__(self, k):
+        res = self[k] = (self.order.get(k, self.maxAts), k)
+        return res
+
+
 class ETWriter(object):
     """ General purpose ElementTree pretty printer complete with options for attribute order
         beyond simple sorting, and which elements should use cdata """
 
     nscount = 0
     indent = "\t"
+    maxAts = 0
 
     def __init__(self, et, namespaces = None, attributeOrder = {}, takesCData = set()):
         self.root = et
@@ -75,72 +90,133 @@ class ETWriter(object):
                 localattribs[lt] = v
         
     def _sortedattrs(self, n, attribs=None):
-        def getorder(x):
-            return self.attributeOrder.get(n.tag, {}).get(x, self.maxAts)
-        def cmpat(x, y):
-            return cmp(getorder(x), getorder(y)) or cmp(x, y)
         if attribs != None :
-            return sorted(attribs, cmp=cmpat)
+            return sorted(attribs, key=self._attrkeys(n.tag).__getitem__)
         else:
-            return sorted(n.keys(), cmp=cmpat)
+            return sorted(n.keys(), key=self._attrkeys(n.tag).__getitem__)
+
+    def _attrkeys(self, tag):
+        """Returns a dict giving the sort key of each attribute name for an element tag"""
+        try:
+            return self._attrkeycache[tag]
+        except AttributeError:
+            self._attrkeycache = {}
+        except KeyError:
+            pass
+        res = _attrKeys(self.attributeOrder.get(tag, {}), self.maxAts)
+        self._attrkeycache[tag] = res
+        return res
+
+    def _attribs(self, base, alt):
+        """Returns the attributes to output for base. alt is as given by _children"""
+        return getattr(base, 'attrib', None)
+
+    def _children(self, base, alt):
+        """Returns (child, alt) pairs for the elements to output inside base, where alt
+            if not None is a value to output for @alt in place of any the child has"""
+        return [(c, None) for c in base]
 
     def serialize_xml(self, write, base = None, indent = '', topns = True, namespaces = {}):
         """Output the object using write() in a normalised way:
-                topns if set puts all namespaces in root element else put them as low as possible"""
+                topns if set puts all namespaces in root element else put them as low as possible.
+            Output is collected into large chunks before being written. The tree is not changed."""
+        out = []
         if base is None:
             base = self.root
-            write('<?xml version="1.0" encoding="utf-8"?>\n')
-        (tag, q, ns) = self._localisens(base.tag)
+            out.append(u'<?xml version="1.0" encoding="utf-8"?>\n')
+        self._serialize(out, write, base, None, indent, topns, namespaces, True)
+        write(u"".join(out))
+
+    def _serialize(self, out, write, base, alt, indent, topns, namespaces, ownns):
+        """Appends the output for base to out, passing it on to write() every so often.
+            ownns says whether namespaces may be added to or must be copied first."""
+        tag = base.tag
+        if tag[0] == '{':
+            (tag, q, ns) = self._localisens(tag)
+        else:
+            q = ns = None
         localattribs = {}
         if ns and ns not in namespaces:
+            if not ownns:
+                namespaces = dict(namespaces)
+                ownns = True
             namespaces[ns] = q
             localattribs['xmlns:'+q] = ns
+        children = self._children(base, alt)
         if topns:
             if base == self.root:
                 for n,q in self.namespaces.items():
                     localattribs['xmlns:'+q] = n
                     namespaces[n] = q
         else:
-            for c in base:
+            for (c, a) in children:
+                if c.tag[0] != '{':
+                    continue
                 (lt, lq, lns) = self._localisens(c.tag)
                 if lns and lns not in namespaces:
+                    if not ownns:
+                        namespaces = dict(namespaces)
+                        ownns = True
                     namespaces[lns] = q
                     localattribs['xmlns:'+lq] = lns
-        self._nsprotectattribs(getattr(base, 'attrib', None), localattribs, namespaces)
+        attribs = self._attribs(base, alt)
+        if attribs is not None:
+            for k, v in attribs.items():
+                if k[0] == '{':
+                    (lt, lq, lns) = self._localisens(k)
+                    if lns and lns not in namespaces:
+                        if not ownns:
+                            namespaces = dict(namespaces)
+                            ownns = True
+                        namespaces[lns] = lq
+                        localattribs['xmlns:'+lq] = lns
+                    localattribs[lt] = v
+                else:
+                    localattribs[k] = v
         for c in getattr(base, 'comments', []):
-            write(u'{}<!--{}-->\n'.format(indent, c))
-        write(u'{}<{}'.format(indent, tag))
+            out.append(u'{}<!--{}-->\n'.format(indent, c))
+        out.append(indent + u'<' + tag)
         if len(localattribs):
-            def getorder(x):
-                return self.attributeOrder.get(tag, {}).get(x, self.maxAts)
-            def cmpattrib(x, y):
-                return cmp(getorder(x), getorder(y)) or cmp(x, y)
-            for k in self._sortedattrs(base, localattribs):
-                write(u' {}="{}"'.format(self._localisens(k)[0], self._protect(localattribs[k])))
-        if len(base):
-            write('>\n')
-            for b in base:
-                self.serialize_xml(write, base=b, indent=indent + self.indent, topns=topns, namespaces=namespaces.copy())
-            write('{}</{}>\n'.format(indent, tag))
+            for k in sorted(localattribs, key=self._attrkeys(base.tag).__getitem__):
+                v = localattribs[k]
+                if '&' in v or '<' in v or '>' in v or '"' in v:
+                    v = v.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+                out.append(u' ' + k + u'="' + v + u'"')
+        if len(children):
+            out.append(u'>\n')
+            cindent = indent + self.indent
+            for (c, a) in children:
+                self._serialize(out, write, c, a, cindent, topns, namespaces, False)
+            out.append(indent + u'</' + tag + u'>\n')
         elif base.text:
             if tag not in self.takesCData:
-                t = self._protect(base.text.replace('\n', '\n' + indent), base=_elementprotect)
+                t = base.text.replace('\n', '\n' + indent)
+                if '&' in t or '<' in t or '>' in t:
+                    t = t.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
             else:
                 t = "<![CDATA[\n\t" + indent + base.text.replace('\n', '\n\t' + indent) + "\n" + indent + "]]>"
-            write(u'>{}</{}>\n'.format(t, tag))
+            out.append(u'>' + t + u'</' + tag + u'>\n')
         else:
-            write('/>\n')
+            out.append(u'/>\n')
         for c in getattr(base, 'commentsafter', []):
-            write(u'{}<!--{}-->\n'.format(indent, c))
+            out.append(u'{}<!--{}-->\n'.format(indent, c))
+        if len(out) > 4096:
+            write(u"".join(out))
+            del out[:]
 
     def add_namespace(self, q, ns):
         if ns in self.namespaces: return self.namespaces[ns]
         self.namespaces[ns] = q
+        self._nspaths = {}
         return q
 
     def addnode(self, parent, tag, **kw):
         return et.SubElement(parent, tag, **kw)
 
+    def unshare(self, e, parent):
+        """Returns an element that may be modified in place of e, a child of parent"""
+        return e
+
     def unify_path(self, path, base=None, draft=None, alt=None, matchdraft=None):
         '''Path contains a list of tags or (tag, attrs) to search in succession'''
         if base is None:
@@ -156,14 +232,8 @@ class ETWriter(object):
             else:
                 tag, attrs = (p, {})
             for job in curr:
-                for c in job:
-                    if c.tag != tag:
-                        continue
-                    for k, v in attrs.items():
-                        if c.get(k, '') != v:
-                            break
-                    else:
-                        newcurr.append(c)
+                for c in _childrenmatching(job, tag, attrs):
+                    newcurr.append(self.unshare(c, job))
             if matchdraft is not None and i == len(path)-1:
                 temp = newcurr
                 newcurr = []
@@ -179,10 +249,13 @@ class ETWriter(object):
                         tests = c.alternates.keys()
                     else:
                         tests = [realalt]
-                    for r in (c.alternates.get(t, None) for t in tests):
+                    for t in tests:
+                        r = c.alternates.get(t, None)
                         if r is None:
                             continue
-                        elif matchdraft == 'alt' or r.get('draft', '') == draft:
+                        if getattr(r, 'frozen', False):
+                            r = c.alternates[t] = self.unshare(r, None)
+                        if matchdraft == 'alt' or r.get('draft', '') == draft:
                             newcurr.append(r)
             if not len(newcurr):
                 job = curr[0]
@@ -196,22 +269,21 @@ class ETWriter(object):
         if path.startswith("/"):
             raise SyntaxError
         steps = []
-        for s in path.split("/"):
-            parts = re.split(ur"\[(.*?)\]", s)
-            tag = parts.pop(0)
+        for (tag, attrs) in _parsepath(path):
             tag = self._reverselocalns(tag)
-            if not len(parts):
-                steps.append(tag)
-                continue
-            attrs = {}
-            for p in parts:
-                if not len(p): continue
-                (k, v) = p.replace(' ','').split("=")
-                if k.startswith("@") and v[0] in '"\'':
-                    attrs[k[1:]] = v[1:-1]
-            steps.append((tag, attrs))
+            steps.append(tag if attrs is None else (tag, dict(attrs)))
         return self.unify_path(steps, base=base, draft=draft, alt=alt, matchdraft=matchdraft)
 
+    def unshare_path(self, path, base=None):
+        """ Returns the elements path finds from base, or the root, in document order, each
+            made private, as is every element on the way to it, so that they may be changed.
+            Unlike ensure_path, nothing is added if the path is not there. """
+        curr = [base if base is not None else self.root]
+        for (tag, attrs) in _parsepath(path):
+            tag = self._reverselocalns(tag)
+            curr = [self.unshare(c, job) for job in curr for c in _childrenmatching(job, tag, attrs or {})]
+        return curr
+
     def _reverselocalns(self, tag):
         '''Convert ns:tag -> {fullns}tag'''
         nsi = tag.find(":")
@@ -229,11 +301,51 @@ class ETWriter(object):
         return et.SubElement(parent, tag, **k)
 
 
+_parsedpaths = {}
+
+def _parsepath(path):
+    """Splits an ensure_path() path into a list of (tag, attrs), where attrs is None for a
+        step with no [] parts. Results are cached, so must not be changed."""
+    res = _parsedpaths.get(path, None)
+    if res is None:
+        res = []
+        for s in path.split("/"):
+            parts = re.split(ur"\[(.*?)\]", s)
+            tag = parts.pop(0)
+            if not len(parts):
+                res.append((tag, None))
+                continue
+            attrs = {}
+            for p in parts:
+                if not len(p): continue
+                (k, v) = p.replace(' ','').split("=")
+                if k.startswith("@") and v[0] in '"\'':
+                    attrs[k[1:]] = v[1:-1]
+            res.append((tag, attrs))
+        if len(_parsedpaths) > 10000:
+            _parsedpaths.clear()
+        _parsedpaths[path] = res
+    return res
+
 def etwrite(et, write, topns = True, namespaces = None):
     if namespaces is None: namespaces = {}
     base = ETWriter(et, namespaces)
     base.serialize_xml(write, topns = topns)
     
+_digits = set('0123456789.')
+
+def _idkey(v):
+    """ Sort key for an @id value. Numeric ids sort by value, between the other ids that
+        are less than '0' as strings and those that are not, each sorted as strings. Comparing
+        numbers by value but the rest as strings gives no consistent order when ids like "10a"
+        and "9" are mixed, so there this order differs from that comparison. """
+    if all(q in _digits for q in v):
+        try:
+            return (1, float(v))
+        except ValueError:
+            pass
+    return (0 if v < '0' else 2, v)
+
 _alldrafts = ('approved', 'contributed', 'provisional', 'unconfirmed', 'tentative', 'generated', 'suspect')
 draftratings = dict(map(lambda x: (x[1], x[0]), enumerate(_alldrafts)))
 
@@ -255,7 +367,21 @@ class _arrayDict(dict):
         if not len(self[k]): del self[k]
         
 
+_stablecache = {}
+
+def stablehash(v):
+    """Hashes a string to 64 bits, giving the same value in every process and run"""
+    res = _stablecache.get(v, None)
+    if res is None:
+        if len(_stablecache) > 100000:
+            _stablecache.clear()
+        res = struct.unpack('<Q', hashlib.md5(v.encode('utf-8') if isinstance(v, unicode) else v).digest()[:8])[0]
+        _stablecache[v] = res
+    return res
+
+
 class _minhash(object):
+    __slots__ = ('minhash', 'hashed', 'hasher')
     _maxbits = 56
     _bits = 4
     _mask = 0xFFFFFFFFFFFFFFFF
@@ -274,10 +400,25 @@ class _minhash(object):
     def __hash__(self):
         return self.hashed
 
+    def __getstate__(self):
+        return (self.minhash, self.hashed, self.hasher)
+
+    def __setstate__(self, state):
+        (self.minhash, self.hashed, self.hasher) = state
+
+    @classmethod
+    def fromvalue(cls, hashed):
+        res = cls(nominhash = True)
+        res.hashed = hashed
+        return res
+
     def update(self, *vec):
         h = map(self.hasher, vec)
         if self.minhash is not None: map(self._minhashupdate, h)
-        self.hashed = reduce(lambda x,y:x * 1000003 + y, h, self.hashed) & self._mask
+        res = self.hashed
+        for x in h:
+            res = res * 1000003 + x
+        self.hashed = res & self._mask
 
     def merge(self, aminh):
         if self.minhash is not None and aminh.minhash is not None: self._minhashupdate(aminh.minhash)
@@ -299,10 +440,694 @@ class _minhash(object):
         return res
 
 
+_etmethods = et.Element.__dict__
+_indexmin = 16          # children an element needs before child lookups use an index
+_hashkey = '#attrHash'  # childindex() key for the index on attrHash
+
+def _indexkey(e, attr):
+    if attr is None:
+        return e.tag
+    elif attr is _hashkey:
+        return e.attrHash
+    return (e.tag, e.get(attr, ''))
+
+class _LdmlAttrib(dict):
+    """ The attributes of an LdmlElement, owner, which it is told of before they change """
+    __slots__ = ('owner',)
+
+    def __setitem__(self, k, v):
+        self.owner._attribchanging(k)
+        dict.__setitem__(self, k, v)
+
+    def __delitem__(self, k):
+        self.owner._attribchanging(k)
+        dict.__delitem__(self, k)
+
+    def pop(self, k, *default):
+        if k not in self:
+            return dict.pop(self, k, *default)
+        self.owner._attribchanging(k)
+        return dict.pop(self, k)
+
+    def setdefault(self, k, v=None):
+        if k not in self:
+            self.owner._attribchanging(k)
+        return dict.setdefault(self, k, v)
+
+    def popitem(self):
+        self.owner._attribchanging()
+        return dict.popitem(self)
+
+    def clear(self):
+        self.owner._attribchanging()
+        dict.clear(self)
+
+    def update(self, *a, **kw):
+        self.owner._attribchanging()
+        dict.update(self, *a, **kw)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class LdmlElement(object):
+    """ Element used in Ldml trees. It records whether its subtree has changed since it was
+        last normalised, so normalise() can skip what has not, and calculates its hashes
+        lazily, when they are first asked for. Structural changes and changes to .text or
+        .attrib mark the element and its ancestors as changed. A frozen element, shared
+        between trees, raises TypeError on any change, including to .text, .tail and .attrib.
+        Large elements keep indexes of their children for lookups, see childindex().
+        Its fields are slots, to keep trees small, so it does not derive from et.Element
+        but has the same interface. Optional fields, such as alternates, are only set if used. """
+
+    __slots__ = ('tag', '_attrib', '_text', '_tail', '_children',
+                 'normalised',      # usedrafts value it was last normalised with, None if changed since
+                 'frozen',          # shared between trees by an Interner, so may not be changed
+                 '_contentHash', '_attrHash', '_index', 'document', 'parent', '_comments', '_commentsafter',
+                 'alternates', 'mergeOther', 'mergeBase', 'tempnode', '__weakref__')
+
+    def __init__(self, tag, attrib={}, **extra):
+        attrib = _LdmlAttrib(attrib)
+        if extra:
+            dict.update(attrib, extra)
+        attrib.owner = self
+        self.tag = tag
+        self._attrib = attrib
+        self._children = []
+        self._text = None
+        self._tail = None
+        self.normalised = None
+        self.frozen = False
+        self._contentHash = None
+        self._attrHash = None
+        self._index = None
+
+    # these only use the fields above
+    __repr__ = _etmethods['__repr__']
+    makeelement = _etmethods['makeelement']
+    __len__ = _etmethods['__len__']
+    __nonzero__ = _etmethods['__nonzero__']
+    __getitem__ = _etmethods['__getitem__']
+    getchildren = _etmethods['getchildren']
+    findtext = _etmethods['findtext']
+    iter = _etmethods['iter']
+    getiterator = _etmethods['getiterator']
+    itertext = _etmethods['itertext']
+
+    def __getstate__(self):
+        return dict((k, getattr(self, k)) for k in self.__slots__[:-1] if hasattr(self, k))
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v if k != '_attrib' else self._ownattrib(v))
+
+    def _ownattrib(self, val):
+        res = _LdmlAttrib(val)
+        res.owner = self
+        return res
+
+    def copy(self):
+        res = LdmlElement(self.tag, self._attrib)
+        res._text = self.text
+        res._tail = self._tail
+        res._children = list(self._children)
+        return res
+
+    def _getattrib(self):
+        return self._attrib
+
+    def _setattrib(self, val):
+        self._attribchanging()
+        self._attrib = self._ownattrib(val)
+
+    attrib = property(_getattrib, _setattrib)
+
+    def get(self, key, default=None):
+        return self._attrib.get(key, default)
+
+    def keys(self):
+        return self._attrib.keys()
+
+    def items(self):
+        return self._attrib.items()
+
+    def _gettext(self):
+        return self._text
+
+    def _settext(self, val):
+        if val != self._text or self.frozen:
+            self._changed()
+        self._text = val
+
+    text = property(_gettext, _settext)
+
+    def _gettail(self):
+        return self._tail
+
+    def _settail(self, val):
+        self._unfrozen()
+        self._tail = val
+
+    tail = property(_gettail, _settail)
+
+    def _getcomments(self):
+        return self._comments
+
+    def _setcomments(self, val):
+        self._unfrozen()
+        self._comments = val
+
+    def _delcomments(self):
+        self._unfrozen()
+        del self._comments
+
+    comments = property(_getcomments, _setcomments, _delcomments)
+
+    def _getcommentsafter(self):
+        return self._commentsafter
+
+    def _setcommentsafter(self, val):
+        self._unfrozen()
+        self._commentsafter = val
+
+    def _delcommentsafter(self):
+        self._unfrozen()
+        del self._commentsafter
+
+    commentsafter = property(_getcommentsafter, _setcommentsafter, _delcommentsafter)
+
+    def find(self, path, namespaces=None):
+        steps = _simplepath(path) if namespaces is None else None
+        if steps is None:
+            return ep.find(self, path, namespaces)
+        return next(_itersteps(self, steps, 0), None)
+
+    def findall(self, path, namespaces=None):
+        steps = _simplepath(path) if namespaces is None else None
+        if steps is None:
+            return ep.findall(self, path, namespaces)
+        return list(_itersteps(self, steps, 0))
+
+    def iterfind(self, path, namespaces=None):
+        steps = _simplepath(path) if namespaces is None else None
+        if steps is None:
+            return ep.iterfind(self, path, namespaces)
+        return _itersteps(self, steps, 0)
+
+    def _unfrozen(self):
+        if self.frozen:
+            raise TypeError("Shared element <{}> may not be changed, use Ldml.unshare()".format(self.tag))
+
+    def _changed(self):
+        self._unfrozen()
+        e = self
+        while e is not None and (e.normalised is not None or e._contentHash is not None):
+            e.normalised = None
+            e._contentHash = None
+            e = getattr(e, 'parent', None)
+
+    def touch(self):
+        """ Marks this element and its ancestors as changed, for when something it holds
+            has been changed in place. Setting .text or changing .attrib does this already. """
+        self._changed()
+        self._attrHash = None
+        p = getattr(self, 'parent', None)
+        if p is not None and p._index is not None and any(c is self for c in p._children):
+            p._index = dict((k, v) for k, v in p._index.items() if k is None)
+
+    def childindex(self, attr=None):
+        """ Returns a dict from tag, or from (tag, value of attr or '' if missing), or from
+            attrHash if attr is _hashkey, to a list of the children, in order, that have it.
+            Each index is built when first asked for and then kept up to date as children
+            are added and removed, or change their attributes. """
+        if self._index is None:
+            self._index = {}
+        res = self._index.get(attr, None)
+        if res is None:
+            res = self._index[attr] = {}
+            for c in self._children:
+                res.setdefault(_indexkey(c, attr), []).append(c)
+        return res
+
+    def _indexadd(self, e):
+        for attr, d in self._index.items():
+            if attr is _hashkey and getattr(e, '_attrHash', None) is None:
+                del self._index[attr]       # rather than hash a whole new subtree
+            else:
+                d.setdefault(_indexkey(e, attr), []).append(e)
+
+    def _indexremove(self, e):
+        for attr, d in self._index.items():
+            l = d.get(_indexkey(e, attr), [])
+            for i, c in enumerate(l):
+                if c is e:
+                    del l[i]
+                    break
+            else:
+                del self._index[attr]       # out of step, so rebuild when next needed
+
+    def _indexreplace(self, old, new):
+        for attr, d in self._index.items():
+            l = d.get(_indexkey(old, attr), [])
+            for i, c in enumerate(l):
+                if c is old:
+                    l[i] = new
+                    break
+            else:
+                del self._index[attr]       # out of step, so rebuild when next needed
+
+    def _calc(self):
+        doc = self.document
+        doc._calc_hashes(self, doc.useDrafts)
+
+    def _getcontentHash(self):
+        if self._contentHash is None:
+            self._calc()
+        return self._contentHash
+
+    def _setcontentHash(self, val):
+        self._contentHash = val
+
+    def _delcontentHash(self):
+        self._contentHash = None
+
+    contentHash = property(_getcontentHash, _setcontentHash, _delcontentHash)
+
+    def _getattrHash(self):
+        if self._attrHash is None:
+            self._calc()
+        return self._attrHash
+
+    def _setattrHash(self, val):
+        self._attrHash = val
+
+    attrHash = property(_getattrHash, _setattrHash)
+
+    def _adopt(self, e):
+        if getattr(e, 'frozen', False):
+            return
+        e.parent = self
+        if not hasattr(e, 'document') and hasattr(self, 'document'):
+            e.document = self.document
+
+    def __setitem__(self, index, element):
+        self._changed()
+        if isinstance(index, slice):
+            element = list(element)
+        self._children[index] = element
+        self._index = None
+
+    def __delitem__(self, index):
+        self._changed()
+        del self._children[index]
+        self._index = None
+
+    def append(self, element):
+        self._changed()
+        self._children.append(element)
+        self._adopt(element)
+        if self._index is not None:
+            self._indexadd(element)
+
+    def extend(self, elements):
+        self._changed()
+        elements = list(elements)
+        self._children.extend(elements)
+        for e in elements:
+            self._adopt(e)
+            if self._index is not None:
+                self._indexadd(e)
+
+    def insert(self, index, element):
+        self._changed()
+        self._children.insert(index, element)
+        self._adopt(element)
+        self._index = None
+
+    def remove(self, element):
+        self._changed()
+        self._children.remove(element)
+        if self._index is not None:
+            self._indexremove(element)
+
+    def clear(self):
+        self._changed()
+        self.attrib.clear()
+        self._children = []
+        self.text = self.tail = None
+        self._attrHash = None
+        self._index = None
+
+    def set(self, key, value):
+        self.attrib[key] = value
+
+    def _attribchanging(self, key=None):
+        """ Marks this element as changed before attribute key, or any if None, changes,
+            dropping the parent's child indexes it could be out of step with """
+        self._changed()
+        p = getattr(self, 'parent', None)
+        if p is not None and p._index is not None:
+            if key is None:
+                p._index = dict((k, v) for k, v in p._index.items() if k is None)
+            else:
+                for attr in (key, _hashkey):
+                    if attr not in p._index or (attr is _hashkey and self._attrHash is None):
+                        continue        # any indexed child has its attrHash
+                    if any(c is self for c in p._index[attr].get(_indexkey(self, attr), [])):
+                        del p._index[attr]
+        self._attrHash = None
+
+
+class _LdmlSection(LdmlElement):
+    """ A top level element of a lazily read Ldml whose text and children have yet to be
+        parsed. Asking for either parses them and turns it into a plain LdmlElement. """
+    __slots__ = ()
+
+    def _load(self):
+        self.document._loadsection(self)
+
+    def _getchildren(self):
+        self._load()
+        return self._children
+
+    def _setchildren(self, val):
+        self._load()
+        self._children = val
+
+    _children = property(_getchildren, _setchildren)
+
+    def _gettext(self):
+        self._load()
+        return self.text
+
+    def _settext(self, val):
+        self._load()
+        self.text = val
+
+    text = property(_gettext, _settext)
+
+    def makeelement(self, tag, attrib):
+        return LdmlElement(tag, attrib)
+
+    def __reduce_ex__(self, protocol):
+        self._load()
+        return self.__reduce_ex__(protocol)
+
+
+def _childrenmatching(parent, tag, attrs, default=''):
+    """Returns the children of parent with the given tag and attribute values, where a
+        missing attribute has the default value"""
+    if len(parent) < _indexmin or not hasattr(parent, 'childindex'):
+        cands = parent
+    elif len(attrs):
+        k = min(attrs)
+        cands = parent.childindex(k).get((tag, attrs[k]), ())
+    else:
+        cands = parent.childindex().get(tag, ())
+    return [c for c in cands if c.tag == tag and all(c.get(k, default) == v for k, v in attrs.items())]
+
+def _childrenbyhash(parent, ahash):
+    """Returns the children of parent with the given attrHash"""
+    if len(parent) < _indexmin:
+        return [x for x in parent if x.attrHash == ahash]
+    return [x for x in parent.childindex(_hashkey).get(ahash, ()) if x.attrHash == ahash]
+
+_xmlskip = r"<!--.*?-->|<\?.*?\?>|<!\[CDATA\[.*?\]\]>"
+_xmltop = re.compile(_xmlskip + r"""|<!DOCTYPE(?:[^\[>]|\[.*?\])*>|<(/?)([^\s/>!?]+)((?:[^>"']|"[^"]*"|'[^']*')*)>""", re.S)
+_xmlnsdecl = re.compile(r"""xmlns:([\w.\-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_xmlends = {}
+
+def _scansections(data):
+    """ Scans the bytes of an XML document for the elements in its root element. Returns
+        (prolog, sections, tail), where prolog runs to the end of the root start tag, tail
+        from the root end tag, and sections lists (tag, start tag, start, end) for each
+        element, whose range starts after the previous one so as to take any comments
+        before it. Returns None if the document does not scan. """
+    prolog = None
+    sections = []
+    pos = 0
+    while True:
+        m = _xmltop.search(data, pos)
+        if m is None:
+            return None
+        pos = m.end()
+        if m.group(2) is None:
+            continue
+        if prolog is None:
+            if m.group(1) or m.group(3).endswith('/'):
+                return None
+            prolog = data[:pos]
+            root = m.group(2)
+            chunk = pos
+        elif m.group(1):
+            if m.group(2) != root:
+                return None
+            if len(sections):
+                sections[-1][3] = m.start()     # with any comments at the end of the root
+            return (prolog, [tuple(x) for x in sections], data[m.start():])
+        else:
+            if not m.group(3).endswith('/'):
+                pos = _scanend(data, m.group(2), pos)
+                if pos is None:
+                    return None
+            sections.append([m.group(2), m.group(0), chunk, pos])
+            chunk = pos
+
+def _scanend(data, tag, pos):
+    """Returns the position after the end tag of the element tag whose start tag ends at pos"""
+    r = _xmlends.get(tag, None)
+    if r is None:
+        r = _xmlends[tag] = re.compile(_xmlskip + r"""|<(/?)""" + re.escape(tag) + r"""(?=[\s/>])((?:[^>"']|"[^"]*"|'[^']*')*)>""", re.S)
+    depth = 1
+    for m in r.finditer(data, pos):
+        if m.group(2) is None:
+            continue
+        if m.group(1):
+            depth -= 1
+            if not depth:
+                return m.end()
+        elif not m.group(2).endswith('/'):
+            depth += 1
+    return None
+
+def _itersteps(elem, steps, i):
+    (tag, attrs) = steps[i]
+    for c in _childrenmatching(elem, tag, attrs, None):
+        if i == len(steps) - 1:
+            yield c
+        else:
+            for r in _itersteps(c, steps, i + 1):
+                yield r
+
+_pathstep = re.compile(ur"""((?:\{[^}]*\})?[A-Za-z_][\w.\-]*)((?:\[@(?:\{[^}]*\})?[\w.\-]+=(?:"[^"]*"|'[^']*')\])*)(?:/|$)""")
+_pathpred = re.compile(ur"""\[@((?:\{[^}]*\})?[\w.\-]+)=(?:"([^"]*)"|'([^']*)')\]""")
+_simplepaths = {}
+
+def _simplepath(path):
+    """Parses a path of plain child steps, such as a/b[@type="c"], into a list of
+        (tag, attrs), or returns None if it uses anything else that ElementPath allows"""
+    res = _simplepaths.get(path, False)
+    if res is False:
+        res = []
+        p = path[2:] if path.startswith('./') else path
+        pos = 0
+        while pos < len(p) or not len(res):
+            m = _pathstep.match(p, pos)
+            if m is None or m.end() == pos or (m.end() == len(p) and p.endswith('/')):
+                res = None
+                break
+            attrs = {}
+            for a in _pathpred.finditer(m.group(2)):
+                attrs[a.group(1)] = a.group(2) if a.group(2) is not None else a.group(3)
+            res.append((m.group(1), attrs))
+            pos = m.end()
+        if len(_simplepaths) > 10000:
+            _simplepaths.clear()
+        _simplepaths[path] = res
+    return res
+
+
+def _hasalias(e):
+    """Returns whether there is an alias anywhere in e"""
+    return any(x.tag == 'alias' for x in e.iter())
+
+def _share(e):
+    """Freezes e and everything in it that is not frozen already"""
+    if e.frozen:
+        return
+    for c in e:
+        _share(c)
+    for a in getattr(e, 'alternates', {}).values():
+        _share(a)
+    e.frozen = True
+
+
+class Interner(object):
+    """ Shares one frozen instance of each distinct subtree between all the trees interned
+        through it, so that many locales can be held in memory at once. Candidates are found
+        by their hashes and then compared exactly, children first, so sharing never changes
+        what a tree holds. Shared subtrees are only kept while some tree still uses them. """
+
+    def __init__(self):
+        self.nodes = weakref.WeakValueDictionary()
+
+    def intern(self, e):
+        """Returns the shared instance of the subtree e, freezing e if it is the first seen"""
+        if e.frozen:
+            return e
+        children = [self.intern(c) for c in e]
+        alts = getattr(e, 'alternates', None)
+        if alts is not None:
+            alts = dict((k, self.intern(v)) for k, v in alts.items())
+        key = (e.attrHash.hashed, e.contentHash.hashed)
+        s = self.nodes.get(key, None)
+        if s is not None and self._same(s, e, children, alts):
+            return s
+        e._children[:] = children       # no change in content
+        e._index = None
+        if alts is not None:
+            e.alternates = alts
+        if s is None:
+            e.frozen = True
+            self.nodes[key] = e
+        return e
+
+    def _same(self, s, e, children, alts):
+        if s.tag != e.tag or s.text != e.text or s.attrib != e.attrib or len(s) != len(children):
+            return False
+        for a in ('comments', 'commentsafter'):
+            if getattr(s, a, None) != getattr(e, a, None):
+                return False
+        for a, b in zip(s, children):
+            if a is not b:
+                return False
+        salts = getattr(s, 'alternates', None)
+        if salts is None or alts is None:
+            return salts is None and alts is None
+        return len(salts) == len(alts) and all(alts.get(k, None) is v for k, v in salts.items())
+
+
+class LdmlCache(object):
+    """ On-disk store of parsed Ldml trees. Each entry holds the normalised and hashed
+        tree of one source file and is only used while the file's size and mtime are
+        unchanged. Entries are written atomically so pool workers can share a directory.
+        Trees hashed with the builtin hash() are not cached if hash randomisation is on,
+        since their hashes would not match those calculated in another process.
+        The content hashes of datafiles, by default those of manifest.ldmldatafiles(), are
+        kept in each entry's header, since a tree's order and hashes also depend on them. """
+
+    version = 2
+    _datahashes = {}    # hashes of each set of datafiles, calculated once per process
+
+    def __init__(self, path, datafiles=None):
+        self.path = path
+        self.datafiles = datafiles
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError:     # another worker got there first
+                pass
+
+    def _entry(self, fname, ldml):
+        fname = os.path.abspath(fname)
+        st = os.stat(fname)
+        mode = ("|d" if ldml.useDrafts else "|n") + ("s" if ldml.stablehashes else "")
+        key = hashlib.sha1((fname + mode).encode('utf-8')).hexdigest()
+        return (os.path.join(self.path, key + '.pickle'),
+                (self.version, fname, st.st_size, st.st_mtime, bool(ldml.useDrafts), bool(ldml.stablehashes),
+                 self._data()))
+
+    def _data(self):
+        from manifest import ldmldatafiles, filehash
+        datafiles = tuple(self.datafiles if self.datafiles is not None else ldmldatafiles())
+        if datafiles not in self._datahashes:
+            self._datahashes[datafiles] = tuple(sorted((os.path.basename(f), filehash(f))
+                                                       for f in datafiles if os.path.exists(f)))
+        return self._datahashes[datafiles]
+
+    def _usable(self, ldml):
+        return ldml.stablehashes or not sys.flags.hash_randomization
+
+    def load(self, ldml, fname):
+        """ Fills in ldml from the cache, returning False if there is no valid entry.
+            An entry that cannot be read, for whatever reason, is treated as missing. """
+        if not self._usable(ldml):
+            return False
+        try:
+            (cname, header) = self._entry(fname, ldml)
+            if not os.path.exists(cname):
+                return False
+            with open(cname, 'rb') as fh:
+                if pickle.load(fh) != header:
+                    return False
+                (namespaces, root) = pickle.load(fh)
+            root = _thawnode(root, ldml, None)
+        except Exception:
+            return False
+        ldml.namespaces.update(namespaces)
+        ldml.root = root
+        return True
+
+    def save(self, ldml, fname):
+        """Stores ldml in the cache, leaving no entry if that fails"""
+        if not self._usable(ldml):
+            return
+        tmpname = None
+        try:
+            (cname, header) = self._entry(fname, ldml)
+            tmpname = "{}.{}.tmp".format(cname, os.getpid())
+            with open(tmpname, 'wb') as fh:
+                pickle.dump(header, fh, pickle.HIGHEST_PROTOCOL)
+                pickle.dump((ldml.namespaces, _freezenode(ldml.root)), fh, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmpname, cname)
+        except Exception:
+            if tmpname is not None and os.path.exists(tmpname):
+                os.remove(tmpname)
+
+
+def _freezenode(e):
+    """Converts an element and its children to nested tuples for LdmlCache"""
+    alts = getattr(e, 'alternates', None)
+    if alts is not None:
+        alts = dict((k, _freezenode(v)) for k, v in alts.items())
+    return (e.tag, e.attrib, e.text, getattr(e, 'comments', None), getattr(e, 'commentsafter', None),
+            alts, e.contentHash.hashed, e.attrHash.hashed, tuple(_freezenode(c) for c in e))
+
+def _thawnode(t, doc, parent):
+    (tag, attrib, text, comments, commentsafter, alts, chash, ahash, children) = t
+    e = LdmlElement(tag, attrib)
+    e.text = text
+    e.document = doc
+    if parent is not None:
+        e.parent = parent
+    if comments is not None:
+        e.comments = comments
+    if commentsafter is not None:
+        e.commentsafter = commentsafter
+    if alts is not None:
+        e.alternates = dict((k, _thawnode(v, doc, parent)) for k, v in alts.items())
+    e[:] = [_thawnode(c, doc, e) for c in children]
+    e.contentHash = _minhash.fromvalue(chash)
+    e.attrHash = _minhash.fromvalue(ahash)
+    e.normalised = doc.useDrafts
+    return e
+
+
 class Ldml(ETWriter):
     takesCData = set(('cr',))
     silns = "urn://www.sil.org/ldml/0.1"
     use_draft = None
+    cache = None        # set to an LdmlCache to reuse parsed trees across runs
+    stablehashes = False    # set to hash with stablehash() rather than the builtin hash()
+
+    @classmethod
+    def preload(cls, supplemental=False):
+        """ Reads the schema tables, and the supplemental data if asked, now rather than when
+            they are first needed, so that worker processes forked later share them """
+        if not hasattr(cls, 'elementOrder'):
+            cls.ReadMetadata()
+        if supplemental and not hasattr(cls, 'parentLocales'):
+            cls.ReadSupplementalData()
 
     @classmethod
     def ReadMetadata(cls, fname = None):
@@ -329,6 +1154,7 @@ class Ldml(ETWriter):
         cls.nonkeyContexts = {}         # cls.nonkeyContexts[element] = set(attributes)
         cls.keyContexts = {}            # cls.keyContexts[element] = set(attributes)
         cls.keys = set()
+        cls._distkeycache = {}          # cls._distkeycache[(element, usedrafts)] = set(attributes)
         for e in base.findall('distinguishing/distinguishingItems'):
             if 'elements' in e.attrib:
                 if e.get('exclude', 'false') == 'true':
@@ -389,21 +1215,26 @@ class Ldml(ETWriter):
 
     @classmethod
     def ReadDTD(cls, fname = None):
-        """Reads LDML DTD to get element and attribute orders"""
+        """Reads LDML DTD to get element and attribute orders, content models and attribute types"""
         if fname is None:
             fname = os.path.join(os.path.dirname(__file__), 'ldml.dtd')
         elementCount = [0]
         cls.attributeOrder = {}
         cls.elementOrder = {}
+        cls.contentModels = {}          # cls.contentModels[element] = expat content model
+        cls.attributeDecls = {}         # cls.attributeDecls[element][attribute] = (type, default, required)
         attribCount = {}
         def elementDecl(name, model):
             elementCount[0] += 1
             cls.elementOrder[name] = elementCount[0]
             cls.attributeOrder[name] = {}
+            cls.contentModels[name] = model
+            cls.attributeDecls[name] = {}
             attribCount[name] = 0
         def attlistDecl(elname, attname, xmltype, default, required):
             attribCount[elname] += 1
             cls.attributeOrder[elname][attname] = attribCount[elname]
+            cls.attributeDecls[elname].setdefault(attname, (xmltype, default, required))
         parser = xml.parsers.expat.ParserCreate()
         parser.ElementDeclHandler = elementDecl
         parser.AttlistDeclHandler = attlistDecl
@@ -414,68 +1245,258 @@ class Ldml(ETWriter):
         cls.maxEls = elementCount[0] + 1
         cls.maxAts = max(attribCount.values()) + 1
 
-    def __init__(self, fname, usedrafts=True):
+    def __init__(self, fname, usedrafts=True, lazy=False, sections=None):
+        """ Reads an LDML file, given by name or as a file object, or makes an empty one if None.
+            If lazy is set, each top level element is only parsed when its contents are first
+            needed. sections is an optional list of the top level element tags to read, the
+            others being left out as though they were not in the file. It implies lazy. """
         if not hasattr(self, 'elementOrder'):
             self.__class__.ReadMetadata()
         self.namespaces = {}
         self.namespaces[self.silns] = 'sil'
+        self._nspaths = {}          # find() paths with namespace prefixes expanded
         self.useDrafts = usedrafts
-        curr = None
-        comments = []
+        lazy = lazy or sections is not None
 
         if fname is None:
-            self.root = et.Element('ldml')
+            self.root = LdmlElement('ldml')
             self.root.document = self
             self.default_draft = 'unconfirmed'
             return
         elif isinstance(fname, basestring):
             self.fname = fname
+            if not lazy and self.cache is not None and self.cache.load(self, fname):
+                self.analyse()
+                return
             fh = open(self.fname, 'rb')     # expat does utf-8 decoding itself. Don't do it twice
         else:
             fh = fname
-        parser = et.XMLParser(target=et.TreeBuilder(), encoding="UTF-8")
-        def doComment(data):
-            # resubmit as new start tag=!-- and sort out in main loop
-            parser.parser.StartElementHandler("!--", ('text', data))
-            parser.parser.EndElementHandler("!--")
-        parser.parser.CommentHandler = doComment
-        for event, elem in et.iterparse(fh, events=('start', 'start-ns', 'end'), parser=parser):
-            if event == 'start-ns':
-                self.namespaces[elem[1]] = elem[0]
-            elif event == 'start':
-                elem.document = self
-                if elem.tag == '!--':
-                    comments.append(elem.get('text'))
-                else:
-                    if len(comments):
-                        elem.comments = comments
-                        comments = []
-                    if curr is not None:
-                        elem.parent = curr
-                    else:
-                        self.root = elem
-                    curr = elem
-            elif elem.tag == '!--':
-                if curr is not None:
-                    curr.remove(elem)
-            else:
-                if len(comments) and len(elem):
-                    elem[-1].commentsafter = comments
-                    comments = []
-                curr = getattr(elem, 'parent', None)
-        fh.close()
+        if lazy:
+            data = fh.read()
+            fh.close()
+            if isinstance(data, unicode):
+                data = data.encode('utf-8')
+            self.root = self._parselazy(data, sections)
+            if self.root is None:
+                self.root = self._parse(StringIO(data))
+        else:
+            self.root = self._parse(fh)
         self.analyse()
         self.normalise(self.root, usedrafts=usedrafts)
+        if not lazy and self.cache is not None and isinstance(fname, basestring):
+            self.cache.save(self, fname)
+
+    def _parse(self, fh, normalise=True):
+        """ Parses an LDML file object into a tree of LdmlElements and returns its root.
+            Comments are kept on the element they come before, or on the last child of
+            the element they end. Unless normalise is False, each element is normalised
+            and hashed as it ends. """
+        usedrafts = self.useDrafts
+        normalisenode = self._normalisenode
+        calc_hashes = self._calc_hashes
+        names = {}
+        stack = []
+        comments = []
+        data = []
+        last = [None, False]        # element any text goes to and whether as its tail
+        res = []
+
+        def fixname(key):
+            name = names.get(key, None)
+            if name is None:
+                name = names[key] = _ascii("{" + key if "}" in key else key)
+            return name
+
+        def flush():
+            text = "".join(data)
+            del data[:]
+            if last[0] is not None and not last[1]:
+                last[0]._text = _ascii(text)    # tails are dropped by normalising anyway
+
+        def start(tag, attrs):
+            if len(data):
+                flush()
+            attrib = {}
+            for i in range(0, len(attrs), 2):
+                attrib[fixname(attrs[i])] = _ascii(attrs[i+1])
+            e = LdmlElement(fixname(tag), attrib)
+            e.document = self
+            if len(comments):
+                e.comments = comments[:]
+                del comments[:]
+            if len(stack):
+                p = stack[-1]
+                e.parent = p
+                p._children.append(e)
+            else:
+                res.append(e)
+            stack.append(e)
+            last[0] = e
+            last[1] = False
+
+        def end(tag):
+            if len(data):
+                flush()
+            e = stack.pop()
+            if len(comments) and len(e._children):
+                e._children[-1].commentsafter = comments[:]
+                del comments[:]
+            if normalise:
+                normalisenode(e, None, usedrafts)
+                calc_hashes(e, usedrafts)
+            last[0] = e
+            last[1] = True
+
+        def comment(text):
+            if len(data):
+                flush()
+            comments.append(_ascii(text))
+            last[0] = None              # text after a comment has always been dropped
+
+        def startns(prefix, uri):
+            self.namespaces[_ascii(uri or "")] = prefix or ""
+
+        parser = xml.parsers.expat.ParserCreate("UTF-8", "}")
+        parser.buffer_text = 1
+        parser.ordered_attributes = 1
+        parser.specified_attributes = 1
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = data.append
+        parser.CommentHandler = comment
+        parser.StartNamespaceDeclHandler = startns
+        try:
+            parser.Parse(fh.read(), 1)
+        except xml.parsers.expat.ExpatError, v:
+            err = et.ParseError(v)
+            err.code = v.code
+            err.position = (v.lineno, v.offset)
+            raise err
+        finally:
+            fh.close()
+        return res[0] if len(res) else None
+
+    def _parselazy(self, data, sections=None):
+        """ Finds the byte range of each top level element in data and parses a skeleton
+            of them with no contents, which are parsed by _loadsection when first needed.
+            Returns the root, or None if data is laid out in a way the scan cannot follow. """
+        scan = _scansections(data)
+        if scan is None:
+            return None
+        (prolog, found, tail) = scan
+        skeleton = [prolog]
+        self._sections = {}
+        kept = []
+        for (tag, starttag, start, end) in found:
+            if sections is not None and tag.split('}')[-1] not in sections:
+                continue
+            skeleton.append(starttag if starttag.endswith('/>') else starttag[:-1] + '/>')
+            kept.append((start, end))
+            for m in _xmlnsdecl.finditer(data, start, end):
+                self.namespaces[m.group(2) or m.group(3)] = m.group(1)
+        skeleton.append(tail)
+        root = self._parse(StringIO("".join(skeleton)), normalise=False)
+        if len(root) != len(kept):
+            return None
+        self._source = (prolog, data, tail)
+        for (e, r) in zip(root, kept):
+            e.__class__ = _LdmlSection
+            e.normalised = self.useDrafts       # the skeleton needs no normalising
+            self._sections[e] = r
+        return root
+
+    def _loadsection(self, e):
+        """Parses the contents of a top level element read by _parselazy into place"""
+        (start, end) = self._sections.pop(e)
+        e.__class__ = LdmlElement
+        (prolog, data, tail) = self._source
+        if not len(self._sections):
+            del self._source
+        s = self._parse(StringIO(prolog + data[start:end] + tail))[0]
+        self.normalise(s, usedrafts=self.useDrafts)
+        e._children = s._children
+        for c in e._children:
+            c.parent = e
+        e.text = s.text
+        for a in ('comments', 'commentsafter'):
+            if hasattr(s, a) and not hasattr(e, a):
+                setattr(e, a, getattr(s, a))
+        e.normalised = s.normalised
 
     def copynode(self, n, parent=None):
         res = n.copy()
-        for a in ('contentHash', 'attrHash', 'comments', 'commentsafter', 'parent', 'document'):
+        for a in ('_contentHash', '_attrHash', 'normalised', 'comments', 'commentsafter', 'parent', 'document'):
             if hasattr(n, a):
                 setattr(res, a, getattr(n, a, None))
         if parent is not None:
             res.parent = parent
         return res
 
+    def copytree(self, n, parent=None):
+        """Returns a deep copy of n and its alternates, keeping hashes and comments"""
+        res = self.copynode(n, parent)
+        res.attrib = dict(n.attrib)
+        res[:] = [self.copytree(c, res) for c in n]
+        for a in ('_contentHash', '_attrHash', 'normalised'):
+            setattr(res, a, getattr(n, a, None))
+        if hasattr(n, 'alternates'):
+            res.alternates = dict((k, self.copytree(v, res.parent if parent is not None else None))
+                                    for k, v in n.alternates.items())
+        return res
+
+    def intern(self, interner):
+        """Replaces the subtrees of this locale with their shared instances in interner.
+            overlay, difference, merge, addnode and ensure_path copy a shared element before
+            changing it. Anything else must call unshare() first."""
+        self.normalise()
+        self.root._children[:] = [interner.intern(c) for c in self.root]
+        self.root._index = None
+
+    def freeze(self, normalise=True):
+        """ Freezes everything below the root, so that it may be shared with other trees, as
+            an Interner does. Changes then copy only the elements on the path to what they
+            change, see unshare(). Elements frozen before are not visited again, so freezing
+            after some changes costs only as much as the elements they copied. If normalise
+            is False, whoever normalises a tree holding unnormalised frozen elements copies them. """
+        if normalise:
+            self.normalise()
+        for c in self.root:
+            _share(c)
+
+    def snapshot(self):
+        """ Returns a copy of this locale that shares all its elements below the root with
+            it, having frozen them. Either may then be changed without affecting the other. """
+        self.freeze()
+        res = copy.copy(self)
+        res.namespaces = dict(self.namespaces)
+        res._nspaths = {}
+        if hasattr(self, 'depends'):
+            res.depends = list(self.depends)
+        res.root = self.copynode(self.root)
+        res.root.document = res
+        return res
+
+    def unshare(self, e, parent):
+        """If e, a child of parent or an alternate if parent is None, is frozen, by an Interner
+            or freeze(), returns a private copy of it put in its place. Its children are still shared."""
+        if not getattr(e, 'frozen', False):
+            return e
+        res = self.copynode(e, parent)
+        res.document = self
+        for a in ('comments', 'commentsafter'):
+            if hasattr(e, a):
+                setattr(res, a, list(getattr(e, a)))
+        if hasattr(e, 'alternates'):
+            res.alternates = dict(e.alternates)
+        if parent is not None:
+            for i, c in enumerate(parent):
+                if c is e:
+                    parent._children[i] = res       # no change in content
+                    if parent._index is not None:
+                        parent._indexreplace(e, res)
+                    break
+        return res
+
     def addnode(self, parent, tag, attrib={}, alt=None, **attribs):
         attrib = dict((k,v) for k,v in attrib.items() if v) # filter @x=""
         attrib.update(attribs)
@@ -487,12 +1508,11 @@ class Ldml(ETWriter):
             alt = self.alt(alt)
             if 'draft' not in e.attrib and self.use_draft is not None:
                 e.set('draft', self.use_draft)
-            self._calc_hashes(e, self.useDrafts)
-            equivs = [x for x in parent if x.attrHash == e.attrHash]
+            equivs = _childrenbyhash(parent, e.attrHash)
             if len(equivs):
                 if 'alt' not in e.attrib:
                     e.set('alt', alt)
-                return self._add_alt_leaf(equivs[0], e, default=e.get('draft', None), leaf=True, alt=alt)
+                return self._add_alt_leaf(self.unshare(equivs[0], parent), e, default=e.get('draft', None), leaf=True, alt=alt)
         parent.append(e)
         return e
 
@@ -592,8 +1612,10 @@ class Ldml(ETWriter):
 
         if elem is None:
             elem = self.root
-        path = re.sub(ur"([a-z0-9]+):", nstons, path)
-        return elem.find(path)
+        res = self._nspaths.get(path, None)
+        if res is None:
+            res = self._nspaths[path] = re.sub(ur"([a-z0-9]+):", nstons, path)
+        return elem.find(res)
 
     def get_parent_locales(self, name):
         if not hasattr(self, 'parentLocales'):
@@ -607,45 +1629,32 @@ class Ldml(ETWriter):
             return []
 
     def normalise(self, base=None, addguids=True, usedrafts=False):
-        """Normalise according to LDML rules"""
-        _digits = set('0123456789.')
+        """Normalise according to LDML rules. Subtrees unchanged since they were last
+            normalised are skipped. Hashes are calculated lazily, according to useDrafts."""
         if base is None:
             base = self.root
+        state = base.normalised
+        if base.frozen or (state is not None and (state or not usedrafts)):
+            return
         if len(base):
-            for b in base:
+            for b in list(base):
+                if b.frozen and (b.normalised is None or (usedrafts and not b.normalised)):
+                    b = self.unshare(b, base)
                 self.normalise(b, addguids=addguids, usedrafts=usedrafts)
-            def getorder(x):
-                return self.attributeOrder.get(base.tag, {}).get(x, self.maxAts)
-            def cmpat(x, y):
-                return cmp(getorder(x), getorder(y)) or cmp(x, y)
-            def cmpel(x, y):   # order by elementOrder and within that attributes in attributeOrder
-                res = cmp(self.elementOrder.get(x.tag, self.maxEls), self.elementOrder.get(y.tag, self.maxEls) or cmp(x.tag, y.tag))
-                if res != 0: return res
-                xl = self._sortedattrs(x)
-                yl = self._sortedattrs(y)
-                for i in range(len(xl)):
-                    if i >= len(yl): return -1
-                    res = cmp(xl[i], yl[i])
-                    if res != 0: return res
-                    a = x.get(xl[i])
-                    b = y.get(yl[i])
-                    if xl[i] == 'id' and all(q in _digits for q in a) and all(q in _digits for q in b):
-                        res = cmp(float(a), float(b))
-                    else:
-                        res = cmp(a, b)
-                    if res != 0: return res
-                if len(yl) > len(xl): return 1
-                return 0
-            children = sorted(base, cmp=cmpel)              # if base.tag not in self.blocks else list(base)
-            base[:] = children
-        if base.text:
-            t = base.text.strip()
-            base.text = re.sub(ur'\s*\n\s*', '\n', t)       # content hash has text in lines
-        base.tail = None
-        if usedrafts or addguids:
-            self._calc_hashes(base, usedrafts=usedrafts)
-        if usedrafts:                                       # pack up all alternates
-            temp = {}
+        self._normalisenode(base, state, usedrafts)
+
+    def _normalisenode(self, base, state, usedrafts):
+        """Normalises base, whose children are already normalised, from the given state"""
+        if state is None:
+            if len(base) > 1:
+                children = sorted(base, key=self._sortkey)     # if base.tag not in self.blocks else list(base)
+                base[:] = children
+            if base.text:
+                t = base.text.strip()
+                base.text = _textlines.sub('\n', t)             # content hash has text in lines
+            base.tail = None
+        if usedrafts and any(c.get('alt', '').find("proposed") != -1 for c in base):
+            temp = {}                                       # pack up all alternates
             for c in base:
                 a = c.get('alt', None)
                 if a is None or a.find("proposed") == -1:
@@ -660,6 +1669,32 @@ class Ldml(ETWriter):
                         t.alternates = {}
                     t.alternates[a] = c
                     base.remove(c)
+        base.normalised = usedrafts
+
+    def rehash(self, base=None):
+        """Calculates any hashes in a subtree that are not yet known, for example after an
+            overlay, so that copies of the subtree share them"""
+        if base is None:
+            base = self.root
+        if base._contentHash is None or base._attrHash is None:
+            for b in base:
+                self.rehash(b)
+            base.contentHash
+        for a in getattr(base, 'alternates', {}).values():
+            self.rehash(a)
+
+    def _sortkey(self, e):
+        """Sort key for an element amongst its siblings: by elementOrder, then by attribute
+            names and values taken in attributeOrder, where an element with more attributes
+            goes first if the others match. Numeric @id values are compared as numbers."""
+        attrib = e.attrib
+        if len(attrib) > 1:
+            names = sorted(attrib, key=self._attrkeys(e.tag).__getitem__)
+        else:
+            names = attrib.keys()
+        attrs = [(0, k, (attrib[k] if k != 'id' else _idkey(attrib[k]))) for k in names]
+        attrs.append((1,))
+        return (self.elementOrder.get(e.tag, self.maxEls), attrs)
 
     def analyse(self):
         identity = self.root.find('./identity/special/{' + self.silns + '}identity')
@@ -670,83 +1705,104 @@ class Ldml(ETWriter):
             self.default_draft = 'unconfirmed'
             self.uid = None
 
+    def _distkeys(self, tag, usedrafts):
+        """Returns the set of key attribute names for elements with the given tag"""
+        res = self._distkeycache.get((tag, usedrafts), None)
+        if res is None:
+            res = set(self.keys)
+            if tag in self.nonkeyContexts:
+                res -= self.nonkeyContexts[tag]
+            if tag in self.keyContexts:
+                res |= self.keyContexts[tag]
+            if usedrafts:
+                res.discard('draft')
+            self._distkeycache[(tag, usedrafts)] = res
+        return res
+
     def _calc_hashes(self, base, usedrafts=False):
-        base.contentHash = _minhash(nominhash = True)
+        hasher = stablehash if self.stablehashes else hash
+        contentHash = _minhash(hasher = hasher, nominhash = True)
         for b in base:
-            base.contentHash.merge(b.contentHash)
-        if base.text: base.contentHash.update(*(base.text.split("\n")))
-        distkeys = set(self.keys)
-        if base.tag in self.nonkeyContexts:
-            distkeys -= self.nonkeyContexts[base.tag]
-        if base.tag in self.keyContexts:
-            distkeys |= self.keyContexts[base.tag]
-        if usedrafts:
-            distkeys.discard('draft')
-        base.attrHash = _minhash(nominhash = True)
-        base.attrHash.update(base.tag)                      # keying hash has tag
+            contentHash.merge(b.contentHash)
+        if base.text: contentHash.update(*(base.text.split("\n")))
+        distkeys = self._distkeys(base.tag, usedrafts)
+        attrHash = _minhash(hasher = hasher, nominhash = True)
+        attrHash.update(base.tag)                           # keying hash has tag
         for k, v in sorted(base.items()):                      # any consistent order is fine
             if usedrafts and k == 'alt' and v.find("proposed") != -1:
                 val = re.sub(ur"-?proposed.*$", "", v)
                 if len(val):
-                    base.attrHash.update(k, val)
+                    attrHash.update(k, val)
             elif k in distkeys:
-                base.attrHash.update(k, v)        # keying hash has key attributes
+                attrHash.update(k, v)             # keying hash has key attributes
             elif not usedrafts or (k != 'draft' and k != 'alt' and k != '{'+self.silns+'}alias'):
-                base.contentHash.update(k, v)     # content hash has non key attributes
-        base.contentHash.merge(base.attrHash)               #   and keying hash
+                contentHash.update(k, v)          # content hash has non key attributes
+        contentHash.merge(attrHash)                         #   and keying hash
+        base.contentHash = contentHash
+        base.attrHash = attrHash
 
-    def serialize_xml(self, write, base = None, indent = '', topns = True, namespaces = {}):
+    def _attribs(self, n, alt):
+        res = n.attrib
         if self.useDrafts:
-            n = base if base is not None else self.root
-            draft = n.get('draft', '')
+            draft = res.get('draft', '')
             if draft and (len(n) or draft == self.default_draft):
-                del n.attrib['draft']
-            offset = 0
+                res = dict(res)
+                del res['draft']
+            if alt is not None:
+                res = dict(res)
+                res['alt'] = alt
+        return res
+
+    def _children(self, n, alt):
+        if not self.useDrafts:
+            return [(c, None) for c in n]
+        if alt is None:
             alt = n.get('alt', '')
-            for (i, c) in enumerate(list(n)):
-                if not hasattr(c, 'alternates'): continue
-                for a in sorted(c.alternates.keys()):
-                    c.alternates[a].set('alt', (alt+"-"+a if alt else a))
-                    offset += 1
-                    n.insert(i + offset, c.alternates[a])
-                    c.alternates[a].tempnode = True
-        super(Ldml, self).serialize_xml(write, base, indent, topns, namespaces)
-        if self.useDrafts:
-            n = base if base is not None else self.root
-            for c in list(n):
-                if hasattr(c, 'tempnode') and c.tempnode:
-                    n.remove(c)
+        res = []
+        for c in n:
+            res.append((c, None))
+            if not hasattr(c, 'alternates'): continue
+            for a in sorted(c.alternates.keys()):
+                res.append((c.alternates[a], (alt+"-"+a if alt else a)))
+        return res
 
     def get_draft(self, e, default=None):
         ldraft = e.get('draft', None) if e is not None else None
         if ldraft is not None: return draftratings.get(ldraft, 5)
         return draftratings.get(default, self.default_draft)
 
-    def overlay(self, other, usedrafts=False, this=None):
-        """Add missing information in self from other. Honours @draft attributes"""
+    def overlay(self, other, usedrafts=False, this=None, copy=False):
+        """Add missing information in self from other. Honours @draft attributes.
+            If copy is set, anything added is a copy so that other is left untouched."""
         if this == None: this = self.root
         other = getattr(other, 'root', other)
         for o in other:
             # simple if for now, if more use a dict
             if o.tag == '{'+self.silns+'}external-resources':
-                self._overlay_external_resources(o, this, usedrafts)
+                self._overlay_external_resources(o, this, usedrafts, copy)
             else:
-                self._overlay_child(o, this, usedrafts)
+                self._overlay_child(o, this, usedrafts, copy)
 
-    def _overlay_child(self, o, this, usedrafts):
+    def _overlay_child(self, o, this, usedrafts, copy=False):
         addme = True
-        for t in filter(lambda x: x.attrHash == o.attrHash, this):
+        for t in _childrenbyhash(this, o.attrHash):
             addme = False
             if o.contentHash != t.contentHash:
                 if o.tag not in self.blocks:
-                    self.overlay(o, usedrafts=usedrafts, this=t)
+                    self.overlay(o, usedrafts=usedrafts, this=self.unshare(t, this), copy=copy)
                 elif usedrafts:
-                    self._merge_leaf(other, t, o)
+                    self._merge_leaf(other, self.unshare(t, this), o)
             break  # only do one alignment
         if addme and (o.tag != "alias" or not len(this)):  # alias in effect turns it into blocking
+            if o.frozen:
+                pass                # shared elements are never changed, so need no copy
+            elif copy:
+                o = self.copytree(o, this)
+            else:
+                o.parent = this     # so relative paths, e.g. in aliases, stay in this tree
             this.append(o)
 
-    def _overlay_external_resources(self, other, this, usedrafts):
+    def _overlay_external_resources(self, other, this, usedrafts, copy=False):
         """Handle sil:font fallback mechanism"""
         silfonttag = '{'+self.silns+'}font'
         fonts = []
@@ -770,9 +1826,13 @@ class Ldml(ETWriter):
                             if t in tt:
                                 f.set('types', " ".join(filter(lambda x: x != t, tt)))
                         fonts = filter(lambda x: x.get('types', '') != '', fonts)
+                if copy:
+                    o = self.copytree(o, this)
+                else:
+                    o.parent = this
                 this.append(o)
             else:
-                self._overlay_child(o, this, usedrafts)
+                self._overlay_child(o, this, usedrafts, copy)
         for f in fonts:
             this.append(f)
 
@@ -783,38 +1843,89 @@ class Ldml(ETWriter):
             for (k, v) in o.items():
                 if k not in b.alternates: b.alternates[k] = v
         else:
-            b.alternates = o.alternates
+            b.alternates = dict(o.alternates)
             
-    def resolve_aliases(self, this=None, _cache=None):
+    def resolve_aliases(self, this=None, _cache=None, _memo=None):
+        """ Replaces each alias with copies of what its path points to. Each element an alias
+            points to has its own aliases resolved once, and later aliases to it copy that,
+            unless the result depends on where the copy goes: if the element itself has an
+            alias child, which resolves relative to the copy, or once an alias has been
+            copied unresolved or a loop found, which leave work for a later walk to do.
+            The copies share their contents frozen, so changing one unshares what it changes,
+            except that a copy left holding an alias shares it with its target, for the walk
+            that resolves the target to resolve both. """
         if this is None: this = self.root
         hasalias = False
         if _cache is None:
             _cache = set()
+        if _memo is None:
+            _memo = {}          # _memo[id(target)] = (target, resolved copy), None: if memo is off
+            self._unsharealiases(this)
         for (i, c) in enumerate(list(this)):
             if c.tag == 'alias':
                 v = c.get('path', None)
                 if v is None: continue
                 this.remove(c)
                 count = 1
-                for res in this.findall(v + "/*"):
-                    res = self.copynode(res, parent=this)
+                for t in self._aliastargets(this, v):
                     # res.set('{'+self.silns+'}alias', "1")
                     # self.namespaces[self.silns] = 'sil'
                     if v in _cache:
                         print "Alias loop discovered: %s in %s" % (v, self.fname)
+                        _memo[None] = True
                         return True
-                    _cache.add(v)
-                    self.resolve_aliases(res, _cache)
-                    _cache.remove(v)
+                    done = _memo.get(id(t), None)
+                    if done is not None and done[0] is t and None not in _memo:
+                        res = self.copynode(done[1], parent=this)
+                    else:
+                        local = any(a.tag == 'alias' for a in t)
+                        res = self.copynode(t, parent=this)
+                        _cache.add(v)
+                        self.resolve_aliases(res, _cache, _memo)
+                        _cache.remove(v)
+                        if None not in _memo or not _hasalias(res):
+                            res[:] = [self.copytree(c, res) for c in res]     # rather than share t's
+                        if t.tag == 'alias':
+                            _memo[None] = True
+                        elif not local and None not in _memo:
+                            for m in res:
+                                _share(m)       # later copies share these, so edits unshare them
+                            _memo[id(t)] = (t, res)
                     this.insert(i+count, res)
                     count += 1
                 hasalias = True
-            else:
-                hasalias |= self.resolve_aliases(c)
-        if hasalias and self.useDrafts:
-            self._calc_hashes(this)
-            return True
-        return False
+            elif len(c):
+                if c.frozen:
+                    continue            # has no aliases, see _unsharealiases()
+                hasalias |= self.resolve_aliases(c, _memo=_memo)
+        return hasalias and self.useDrafts
+
+    def _unsharealiases(self, this):
+        """ Makes private every shared element below this with an alias in it, so that
+            aliases are resolved in place, as they are in a tree with nothing shared """
+        for c in list(this):
+            if c.frozen:
+                if not _hasalias(c):
+                    continue
+                c = self.unshare(c, this)
+            if len(c):
+                self._unsharealiases(c)
+
+    def _aliastargets(self, this, path):
+        """Returns this.findall(path + "/*"), following any leading ../ up parent links"""
+        anchor = this
+        rest = path
+        while rest.startswith('../') or rest == '..':
+            anchor = getattr(anchor, 'parent', None)
+            if anchor is None:
+                return this.findall(path + "/*")
+            rest = rest[3:]
+        if not len(rest):
+            return list(anchor)
+        steps = _simplepath(rest)
+        if steps is None:
+            return this.findall(path + "/*")
+        return [c for e in _itersteps(anchor, steps, 0) for c in e]
 
     def alt(self, *a):
         proposed = a[0] if len(a) > 0 and a[0] else 'proposed'
@@ -831,18 +1942,26 @@ class Ldml(ETWriter):
         # if empty elements, test .text and all the attributes
         if not len(other) and not len(this):
             return (other.contentHash == this.contentHash)
+        removed = set()     # removed all together at the end, rather than one at a time
         for o in other:
-            for t in filter(lambda x: x.attrHash == o.attrHash, this):
+            for t in _childrenbyhash(this, o.attrHash):
+                if id(t) in removed:
+                    continue
+                if o.contentHash != t.contentHash and o.tag not in self.blocks:
+                    t = self.unshare(t, this)
                 if o.contentHash == t.contentHash or (o.tag not in self.blocks and self.difference(o, this=t)):
                     if hasattr(t, 'alternates') and hasattr(o, 'alternates'):
+                        t = self.unshare(t, this)
                         for (k, v) in o.alternates:
                             if k in t.alternates and v.contentHash == t.alternates[k].contentHash:
                                 del t.alternates[k]
                         if len(t.alternates) == 0:
-                            this.remove(t)
+                            removed.add(id(t))
                     else:
-                        this.remove(t)
+                        removed.add(id(t))
                 break
+        if len(removed):
+            this[:] = [t for t in this if id(t) not in removed]
         return not len(this) and (not this.text or this.text == other.text)
 
     def _align(self, this, other, base):
@@ -896,6 +2015,8 @@ class Ldml(ETWriter):
         res = False
         if default is None:
             default = base.default_draft
+        base = self.unshare(base, None)     # either may be given alternates
+        other = self.unshare(other, None)
         # if base != target && base better than target
         if base is not None and base.contentHash != target.contentHash and (base.text or base.tag in self.blocks) and self.get_draft(base) < self.get_draft(target, default):
             res = True
@@ -985,6 +2106,8 @@ class Ldml(ETWriter):
         if this == None: this = self.root
         if other is not None and hasattr(other, 'root'): other = other.root
         if base is not None and hasattr(base, 'root'): base = base.root
+        for t in list(this):
+            self.unshare(t, this)
         self._align(this, other, base)
         # other and base can be None
         for t in list(this):       # go through children merging them
@@ -1017,7 +2140,6 @@ class Ldml(ETWriter):
             elif this.text is not None:
                 res = True
                 this.text = None
-                this.contentHash = None
             if self.useDrafts: res |= self._merge_with_alts(base, other, this, default=default, copycomments=copycomments)
         elif base is not None and other is not None and other.text != base.text:
             self.clash_text(this.text, other.text, (base.text if base is not None else None),
@@ -1126,14 +2248,93 @@ class Ldml(ETWriter):
             for e in self.root.findall(n):
                 res.append(e)
                 self.root.remove(e)
-                e.parent = None
+                if not e.frozen:        # else its parent is the tree it is shared from
+                    e.parent = None
+        return res
+
+    def filter_drafts(self, draft, this=None):
+        """ Removes every leaf element whose draft status, its @draft or else the locale's
+            default, is worse than draft, along with its alternates, and any alternate that is
+            worse. Elements left empty go too. The identity and aliases are kept. Shared elements
+            are only copied if something in them goes. Returns whether anything was removed. """
+        threshold = draftratings[draft]
+        if this is None: this = self.root
+        res = False
+        for c in list(this):
+            if c.tag in ('identity', 'alias'):
+                continue
+            if len(c):
+                if c.frozen and not any(self._overdraft(e, threshold) for e in c.iter()):
+                    continue
+                c = self.unshare(c, this)
+                if self.filter_drafts(draft, c):
+                    res = True
+                    if not len(c):
+                        this.remove(c)
+            elif self._overdraft(c, threshold):
+                res = True
+                if self.draftrating(c) > threshold:
+                    this.remove(c)
+                else:
+                    c = self.unshare(c, this)
+                    c.alternates = dict((k, v) for k, v in c.alternates.items()
+                                            if self.draftrating(v) <= threshold)
+                    c.touch()
         return res
 
+    def _overdraft(self, e, threshold):
+        """Returns whether filter_drafts would remove leaf e or any of its alternates"""
+        if len(e) or e.tag == 'alias':
+            return False
+        if self.draftrating(e) > threshold:
+            return True
+        return any(self.draftrating(v) > threshold for v in getattr(e, 'alternates', {}).values())
+
+    def draftrating(self, e):
+        """Returns the index in draftratings of the draft status of e, 0 being approved"""
+        return draftratings.get(e.get('draft', self.default_draft), 5)
+
+    def settle_drafts(self):
+        """ Removes @draft wherever serialize_xml would leave it out, from elements with
+            children and where it is the locale's default, and then reads the default from
+            the identity again, leaving the tree as it would be if written out and read back
+            in. Shared elements are only copied if something in them changes. """
+        if self.useDrafts:
+            self._settle(self.root, self.default_draft)
+        self.analyse()
+
+    def _settle(self, this, default):
+        for c in list(this):
+            if c.frozen and not any(self._unsettled(e, default) for e in c.iter()):
+                continue
+            c = self.unshare(c, this)
+            if self._unsettled(c, default):
+                if self._dropsdraft(c, default):
+                    del c.attrib['draft']
+                alts = getattr(c, 'alternates', {})
+                if any(self._dropsdraft(v, default) for v in alts.values()):
+                    c.alternates = dict(alts)
+                    for (k, v) in alts.items():
+                        if self._dropsdraft(v, default):
+                            v = c.alternates[k] = self.unshare(v, None)
+                            del v.attrib['draft']
+            self._settle(c, default)
+
+    def _dropsdraft(self, e, default):
+        """Returns whether serialize_xml leaves out the @draft of e"""
+        d = e.get('draft', '')
+        return bool(d) and (len(e) > 0 or d == default)
+
+    def _unsettled(self, e, default):
+        """Returns whether settle_drafts would change e or any of its alternates"""
+        return self._dropsdraft(e, default) or any(self._dropsdraft(v, default)
+                                                   for v in getattr(e, 'alternates', {}).values())
+
     def add_silidentity(self, **kws):
         """Inserts attributes in identity/special/sil:identity"""
-        i = self.root.find('identity')
+        i = next(iter(self.unshare_path('identity')), None)
         if i is not None:
-            s = i.find('special/{'+self.silns+'}identity')
+            s = next(iter(self.unshare_path('special/sil:identity', base=i)), None)
             if s is None:
                 se = et.SubElement(i, 'special')
                 if 'sil' not in self.namespaces:
@@ -1144,15 +2345,26 @@ class Ldml(ETWriter):
 
     def flag_nonroots(self):
         """Add @sil:modified="true" to key elements"""
-        for n in self.root.findall('collations/collation'):
+        for n in self.unshare_path('collations/collation'):
             n.set('{'+self.silns+'}modified', 'true')
 
     def flatten_collation(self, collstr, importfn):
         """Flattens [import] statements in a collation tailoring"""
         def doimport(m):
             return self.flatten_collation(importfn(m.group('lang'), m.group('coll')), importfn)
-        return re.sub(ur'\[import\s*(?P<lang>.*?)-u-co-(?P<coll>.*?)\s*\]', doimport, collstr)
+        return _collimport.sub(doimport, collstr)
+
+
+_textlines = re.compile(ur'\s*\n\s*')
 
+def _ascii(s):
+    """Returns s as a str if it is all ascii, as ElementTree does, else unchanged"""
+    try:
+        return s.encode('ascii')
+    except UnicodeError:
+        return s
+
+_collimport = re.compile(ur'\[import\s*(?P<lang>.*?)-u-co-(?P<coll>.*?)\s*\]')
 
 def _prepare_parent(next, token):
     def select(context, result):
@@ -1162,31 +2374,261 @@ def _prepare_parent(next, token):
     return select
 ep.ops['..'] = _prepare_parent
 
-def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, skipstubs=False, fname=None, flattencollation=False):
+def _trimtag(s):
+    r = s.rfind('_')
+    if r < 0:
+        return ''
+    else:
+        return s[:r]
+
+def findldml(lname, dirs):
+    """Returns the path of the file for a locale in a list of (optionally alphadir) directories"""
+    for d in dirs:
+        f = os.path.join(d, lname + '.xml')
+        if os.path.exists(f):
+            return f
+        f = os.path.join(d, lname[0].lower(), lname + '.xml')
+        if os.path.exists(f):
+            return f
+    return None
+
+def _getldml(lname, dirs):
+    if isinstance(dirs, LdmlStage):
+        return dirs.getldml(lname)
+    f = findldml(lname, dirs)
+    return Ldml(f) if f is not None else None
+
+
+class LdmlStage(object):
+    """ Stands in for a directory of LDML files, wherever flattenlocale or FlatAncestors take
+        dirs, holding the results of a processing step in memory instead. fn(lname) makes
+        the Ldml for a locale in lnames, or returns None. Results are frozen and each caller
+        gets a snapshot, which it may change. At most maxsize results are kept, dropping the
+        least recently used, so fn may be called again for a locale, unless it is pinned. """
+
+    def __init__(self, fn, lnames, maxsize=32):
+        self.fn = fn
+        self.lnames = set(lnames)
+        self.maxsize = maxsize
+        self.memo = OrderedDict()
+        self.pinned = {}
+
+    def get(self, lname):
+        """Returns the frozen result for lname, or None if there is none"""
+        if lname in self.pinned:
+            return self.pinned[lname]
+        if lname in self.memo:
+            res = self.memo.pop(lname)
+        elif lname not in self.lnames:
+            return None
+        else:
+            res = self.fn(lname)
+            if res is not None:
+                res.freeze()
+        self.memo[lname] = res
+        while len(self.memo) > self.maxsize:
+            self.memo.popitem(last=False)
+        return res
+
+    def getldml(self, lname):
+        """Returns a copy of the result for lname, that may be changed, or None"""
+        res = self.get(lname)
+        return res.snapshot() if res is not None else None
+
+    def pin(self, lname):
+        """Keeps the result for lname for good. Pin before starting a Pool, so workers share it"""
+        res = self.pinned[lname] = self.get(lname)
+        self.memo.pop(lname, None)
+        return res
+
+
+def mostinherited(lnames, share=0.5):
+    """ Returns the locales that flattening at least share of lnames looks for, as
+        parentLocales and trimming tags give them, with root, most looked for first """
+    Ldml.preload(supplemental=True)
+    uses = {}
+    for l in lnames:
+        seen = set(['root'])
+        for f in Ldml.parentLocales.get(l, [_trimtag(l)]):
+            while len(f) and f not in seen:
+                seen.add(f)
+                f = _trimtag(f)
+        for f in seen:
+            uses[f] = uses.get(f, 0) + 1
+    least = max(2, share * len(lnames))
+    return sorted((f for f in uses if uses[f] >= least), key=lambda f:(-uses[f], f))
+
+
+class FlatAncestors(object):
+    """ Memo of flattened ancestors shared across calls to flattenlocale. Each ancestor
+        is flattened once against its own fallback chain (as trimtag gives it) and root.
+        Memo entries are frozen, so callers share their elements, copying only what they change.
+        At most maxsize entries are kept, dropping the least recently used, besides those
+        preload() makes, which are kept for good. """
+
+    def __init__(self, dirs, maxsize=32):
+        self.dirs = dirs
+        self.maxsize = maxsize
+        self.memo = OrderedDict()
+        self.pinned = {}
+
+    def preload(self, lnames, share=0.5):
+        """ Flattens the ancestors at least share of lnames inherit from and keeps them for good.
+            Preload before starting a Pool, so workers do not each flatten them again. """
+        for f in mostinherited(lnames, share):
+            self.pinned[f] = self._lookup(f)
+            self.memo.pop(f, None)
+        return self
+
+    def _lookup(self, lname):
+        if lname in self.pinned:
+            return self.pinned[lname]
+        if lname in self.memo:
+            res = self.memo.pop(lname)
+        else:
+            l = _getldml(lname, self.dirs)
+            if lname == 'root':
+                res = (l, [lname])
+            else:
+                parent = self.get(_trimtag(lname) or 'root')
+                depends = [lname] + self.depends(_trimtag(lname) or 'root')
+                if l is None:
+                    l = parent
+                elif parent is not None:
+                    if self.get('root') is not None:
+                        l.flag_nonroots()
+                    l.overlay(parent, copy=True)
+                    l.rehash()
+                res = (l, depends)
+            if l is not None:
+                l.freeze(normalise=False)
+        self.memo[lname] = res
+        while len(self.memo) > self.maxsize:
+            self.memo.popitem(last=False)
+        return res
+
+    def get(self, lname):
+        """Returns lname flattened as far as root, or None if nothing is found"""
+        return self._lookup(lname)[0]
+
+    def depends(self, lname):
+        """Returns the list of locales that were looked for in flattening lname"""
+        return self._lookup(lname)[1]
+
+
+class CollationIndex(object):
+    """ Index from (locale, collation type) to the tailoring of that collation with its
+        [import]s flattened, for flattenlocale to use instead of reading each imported
+        locale again. build() reads the collations of every locale in dirs once, so an
+        index built before a Pool is shared by its workers. Without build(), get() reads
+        only the files of the locales it is asked for. If fname is given, build() saves the
+        index there, and later reads only reparse files whose content hash changed.
+        If dirs is an LdmlStage, every locale with collations must be given with add(). """
+
+    collmap = {'phonebk' : 'phonebook'}
+
+    def __init__(self, dirs, fname=None):
+        self.dirs = dirs
+        self.fname = fname
+        self.files = {}         # self.files[lname] = {'hash' : sha1, 'colls' : {type : tailoring}} or None
+        self.flat = {}
+        self.saved = None
+        self.built = False
+
+    @staticmethod
+    def tailorings(l):
+        """Returns a dict of the tailoring of each collation type in an Ldml"""
+        colls = {}
+        for c in l.root.findall('collations/collation'):
+            t = c.get('type')
+            if t is None:
+                continue
+            cr = l.root.find('collations/collation[@type="{}"]/cr'.format(t))
+            colls[t] = cr.text if cr is not None and cr.text else ''
+        return colls
+
+    def add(self, lname, l):
+        """Indexes the collations of lname from an Ldml already in memory, in place of its file"""
+        self.files[lname] = {'hash' : None, 'colls' : self.tailorings(l)}
+        self.flat = {}
+
+    def _saved(self):
+        if self.saved is None:
+            self.saved = {}
+            if self.fname is not None and os.path.exists(self.fname):
+                with open(self.fname) as f:
+                    self.saved = json.load(f)
+        return self.saved
+
+    def _read(self, lname, fname):
+        """ Returns the entry for lname from its file, or None if it has no collations. A saved
+            entry is used if the file's content hash still matches. """
+        with open(fname, 'rb') as f:
+            data = f.read()
+        if '<collations' not in data:
+            return None
+        h = hashlib.sha1(data).hexdigest()
+        entry = self._saved().get(lname, None)
+        if entry is None or entry['hash'] != h:
+            l = Ldml(StringIO(data), sections=['collations'])
+            entry = {'hash' : h, 'colls' : self.tailorings(l)}
+        return entry
+
+    def build(self):
+        self.saved = None
+        lnames = set()
+        for d in self.dirs:
+            for (dp, dn, fn) in os.walk(d):
+                lnames.update(f[:-4] for f in fn if f.endswith('.xml'))
+        self.files = {}
+        self.flat = {}
+        for lname in sorted(lnames):
+            entry = self._read(lname, findldml(lname, self.dirs))
+            if entry is not None:
+                self.files[lname] = entry
+        self.built = True
+        if self.fname is not None:
+            tmpname = self.fname + '.tmp'
+            with open(tmpname, 'w') as f:
+                json.dump(self.files, f, indent=1, sort_keys=True)
+            os.rename(tmpname, self.fname)
+        return self
+
+    def _entry(self, lname):
+        if lname not in self.files and not self.built and not isinstance(self.dirs, LdmlStage):
+            f = findldml(lname, self.dirs) if lname else None
+            self.files[lname] = self._read(lname, f) if f is not None else None
+        return self.files.get(lname, None)
+
+    def get(self, lang, coll):
+        """ Returns (tailoring, depends) for the coll collation of lang, as named in an
+            [import], with its own imports flattened. The tailoring is '' if there is no such
+            collation and depends lists the locales looked for. """
+        key = (lang, coll)
+        res = self.flat.get(key, None)
+        if res is None:
+            lname = 'root' if lang == 'und' else lang
+            depends = [lname]
+            def doimport(m):
+                (text, d) = self.get(m.group('lang'), m.group('coll'))
+                depends.extend(d)
+                return text
+            text = (self._entry(lname) or {}).get('colls', {}).get(self.collmap.get(coll, coll), '')
+            res = self.flat[key] = (_collimport.sub(doimport, text), depends)
+        return res
+
+
+def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, skipstubs=False, fname=None, flattencollation=False, ancestors=None, collations=None):
     """ Flattens an ldml file by filling in missing details from the fallback chain.
         If rev true, then do the opposite and unflatten a flat LDML file by removing
         everything that is the same in the fallback chain.
         changed contains an optional set of locales that if present says that the operation
         is only applied if one or more of the fallback locales are in the changed set.
         autoidentity says to insert or remove script information from the identity element.
+        ancestors is an optional FlatAncestors used to share flattened parents between calls.
+        collations is an optional CollationIndex used to look up collation imports.
+        The returned Ldml has a depends list of the locales that were looked for.
         Values for rev: f - flatten, r - unflatten, c - copy"""
-    def trimtag(s):
-        r = s.rfind('_')
-        if r < 0:
-            return ''
-        else:
-            return s[:r]
-
-    def getldml(lname, dirs):
-        for d in dirs:
-            f = os.path.join(d, lname + '.xml')
-            if os.path.exists(f):
-                return Ldml(f)
-            f = os.path.join(d, lname[0].lower(), lname + '.xml')
-            if os.path.exists(f):
-                return Ldml(f)
-        return None
-
     if isinstance(lname, Ldml):
         l = lname
         lname = fname
@@ -1194,13 +2636,14 @@ def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, sk
         l = Ldml(lname)
         lname = fname
     else:
-        l = getldml(lname, dirs)
+        l = _getldml(lname, dirs)
     if l is None: return l
+    l.depends = [lname]
     if skipstubs and len(l.root) == 1 and l.root[0].tag == 'identity': return None
     if rev != 'c':
         fallbacks = l.get_parent_locales(lname)
         if not len(fallbacks):
-            fallbacks = [trimtag(lname)]
+            fallbacks = [_trimtag(lname)]
         if 'root' not in fallbacks and lname != 'root':
             fallbacks += ['root']
         if len(changed):       # check against changed
@@ -1210,10 +2653,24 @@ def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, sk
                     dome = True
                     break
             if not dome: return None
+        if rev == 'f' and ancestors is not None:
+            if ancestors.get('root') is not None and lname != 'root':
+                l.flag_nonroots()
+            done = False
+            for f in fallbacks:     # each memo entry already has root in it
+                if not len(f) or (f == 'root' and done):
+                    continue
+                o = ancestors.get(f)
+                l.depends.extend(ancestors.depends(f))
+                if o is not None:
+                    l.overlay(o, copy=True)
+                    done = True
+            fallbacks = []
         dome = True
         for f in fallbacks:    # apply each fallback
             while len(f):
-                o = getldml(f, dirs)
+                o = _getldml(f, dirs)
+                l.depends.append(f)
                 if o is not None:
                     if rev == 'r':
                         l.difference(o)
@@ -1223,11 +2680,11 @@ def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, sk
                         if f == 'root':
                             l.flag_nonroots()
                         l.overlay(o)
-                f = trimtag(f)
+                f = _trimtag(f)
             if not dome: break
     if skipstubs and len(l.root) == 1 and l.root[0].tag == 'identity': return None
     if autoidentity:
-        i = l.root.find('identity')
+        i = next(iter(l.unshare_path('identity')), None)
         if i is not None:
             jobs = (('script', l.get_script(lname)),
                     ('territory', l.get_default_territory(lname)))
@@ -1240,19 +2697,26 @@ def flattenlocale(lname, dirs=[], rev='f', changed=set(), autoidentity=False, sk
                 elif curr is None:
                     l.addnode(i, n, type=j)
     if flattencollation:
-        collmap = {'phonebk' : 'phonebook'}
+        collmap = CollationIndex.collmap
         def getcollator(lang, coll):
             try:
                 if l.fname.endswith(lang+'.xml'):
                     c = l
+                elif collations is not None:
+                    (text, depends) = collations.get(lang, coll)
+                    l.depends.extend(depends)
+                    return text
                 else:
-                    c = getldml(('root' if lang == 'und' else lang), dirs)
+                    l.depends.append('root' if lang == 'und' else lang)
+                    c = _getldml(('root' if lang == 'und' else lang), dirs)
                 col = c.root.find('collations/collation[@type="{}"]/cr'.format(collmap.get(coll, coll)))
                 return col.text
             except:
                 return ''
             
-        for i in l.root.findall('collations/collation/cr'):
+        for i in l.unshare_path('collations/collation/cr'):
+            if not i.text:      # an import of nothing leaves an empty cr
+                continue
             i.text = l.flatten_collation(i.text, getcollator)
 
     return l
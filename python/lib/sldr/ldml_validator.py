@@ -0,0 +1,207 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, re
+import xml.parsers.expat
+from xml.parsers.expat import model
+from xml.etree import ElementTree as et
+from ldml import Ldml, draftratings
+
+_nmtoken = re.compile(ur'^[-\w.:]+$', re.U)
+_nmtokens = re.compile(ur'^[-\w.:]+(?:\s+[-\w.:]+)*$', re.U)
+
+def _foreign(name):
+    """Is name, as expat or an Ldml tree gives it, in a namespace other than LDML's"""
+    return name[0] == '{' or ':' in name
+
+def _quant(quant):
+    return {model.XML_CQUANT_OPT : '?', model.XML_CQUANT_REP : '*', model.XML_CQUANT_PLUS : '+'}.get(quant, '')
+
+def _regex(m):
+    """Returns a regular expression matching the child tags, each followed by a space,
+        that the expat content model m allows"""
+    (ctype, quant, name, children) = m
+    if ctype == model.XML_CTYPE_NAME:
+        res = "(?:" + re.escape(name + ' ') + ")"
+    elif ctype == model.XML_CTYPE_MIXED:       # (#PCDATA | a | b)* or (#PCDATA)
+        return "(?:" + "|".join(re.escape(c[2] + ' ') for c in children) + ")*" if len(children) else ''
+    elif ctype == model.XML_CTYPE_EMPTY:
+        res = ''
+    else:
+        res = "(?:" + ("|" if ctype == model.XML_CTYPE_CHOICE else "").join(_regex(c) for c in children) + ")"
+    return res + _quant(quant)
+
+def _modeltext(m):
+    """Returns an expat content model as the DTD gives it"""
+    (ctype, quant, name, children) = m
+    if ctype == model.XML_CTYPE_NAME:
+        res = name
+    elif ctype == model.XML_CTYPE_MIXED:
+        res = "(" + " | ".join(["#PCDATA"] + [c[2] for c in children]) + ")"
+    elif ctype == model.XML_CTYPE_EMPTY:
+        res = "EMPTY"
+    elif ctype == model.XML_CTYPE_ANY:
+        res = "ANY"
+    else:
+        res = "(" + (" | " if ctype == model.XML_CTYPE_CHOICE else ", ").join(_modeltext(c) for c in children) + ")"
+    return res + _quant(quant)
+
+def _runs(children):
+    """Returns the tags in children with each run of the same tag given once, with its length"""
+    res = []
+    for t in children.split():
+        if len(res) and res[-1][0] == t:
+            res[-1][1] += 1
+        else:
+            res.append([t, 1])
+    return u", ".join(t if n == 1 else u"{} x{}".format(t, n) for (t, n) in res)
+
+
+class LdmlValidator(object):
+    """ Checks LDML files against tables compiled once from the DTD, as Ldml.ReadDTD reads it,
+        and the attributeValues choices of supplementalMetadata.xml, if it has any: the
+        children each element allows, as a regular expression over their tags, the attributes
+        it allows and requires, and the values of enumerated and fixed attributes. Elements
+        and attributes in other namespaces, such as sil:, and everything in an element whose
+        content is ANY, such as special, are left alone. @draft may also take the values in
+        draftratings. """
+
+    def __init__(self, metadata=None):
+        if not hasattr(Ldml, 'contentModels'):
+            Ldml.ReadMetadata()
+        self.elements = {}      # self.elements[tag] = (children regex or None for ANY, text allowed, model text)
+        self.attributes = {}    # self.attributes[tag][attribute] = (values or None, fixed or None, type)
+        self.required = {}      # self.required[tag] = required attributes
+        for (tag, m) in Ldml.contentModels.items():
+            if m[0] == model.XML_CTYPE_ANY:
+                regex = None
+            else:
+                regex = re.compile(_regex(m) + "$")
+            self.elements[tag] = (regex, m[0] == model.XML_CTYPE_MIXED, _modeltext(m))
+        for (tag, decls) in Ldml.attributeDecls.items():
+            attrs = self.attributes[tag] = {}
+            self.required[tag] = [a for (a, (t, d, r)) in sorted(decls.items()) if r and d is None]
+            for (a, (t, d, r)) in decls.items():
+                values = None
+                if t.startswith('('):
+                    values = set(v.strip() for v in t[1:-1].split('|'))
+                    if a == 'draft':
+                        values.update(draftratings.keys())
+                attrs[a] = (values, d if r else None, t)
+        self._readvalues(metadata)
+
+    def _readvalues(self, fname):
+        """Restricts attributes to the choices given by attributeValues in supplementalMetadata"""
+        if fname is None:
+            fname = os.path.join(os.path.dirname(__file__), 'supplementalMetadata.xml')
+        base = et.parse(fname).getroot().find('metadata')
+        for v in base.findall('validity/attributeValues'):
+            if v.get('type') != 'choice' or not v.text:
+                continue
+            values = set()
+            for w in v.text.split():
+                if w.startswith('$'):
+                    w = Ldml.variables.get(w[1:], [])
+                    values.update(w if isinstance(w, list) else w.split())
+                else:
+                    values.add(w)
+            for tag in v.get('elements', '').split():
+                for a in v.get('attributes', '').split():
+                    if a in self.attributes.get(tag, {}):
+                        (old, fixed, t) = self.attributes[tag][a]
+                        self.attributes[tag][a] = (values, fixed, t)
+
+    def check(self, tag, attrib, children, hastext):
+        """ Returns a list of the problems with an element, given its tag, attributes, the tags
+            of its children, each followed by a space, joined, and whether it holds text """
+        res = []
+        el = self.elements.get(tag, None)
+        if el is None:
+            return [u"unknown element <{}>".format(tag)]
+        (regex, mixed, modeltext) = el
+        if regex is not None and not regex.match(children):
+            unknown = [c for c in children.split() if c not in self.elements and not _foreign(c)]
+            if len(unknown):
+                res.append(u"unknown element <{}> in <{}>".format(unknown[0], tag))
+            else:
+                res.append(u"<{}> holds {} where {} is allowed".format(tag, _runs(children) or "nothing", modeltext))
+        if hastext and not mixed and regex is not None:
+            res.append(u"<{}> may not hold text".format(tag))
+        attrs = self.attributes[tag]
+        for (k, v) in attrib.items():
+            if _foreign(k) or k == 'xmlns':
+                continue
+            a = attrs.get(k, None)
+            if a is None:
+                res.append(u"<{}> has no attribute {}".format(tag, k))
+                continue
+            (values, fixed, t) = a
+            if values is not None and v not in values:
+                res.append(u'<{} {}="{}"> is not one of {}'.format(tag, k, v, " ".join(sorted(values))))
+            elif fixed is not None and v != fixed:
+                res.append(u'<{} {}="{}"> is fixed as "{}"'.format(tag, k, v, fixed))
+            elif (t == 'NMTOKEN' and not _nmtoken.match(v)) or (t == 'NMTOKENS' and not _nmtokens.match(v)):
+                res.append(u'<{} {}="{}"> is not an {}'.format(tag, k, v, t))
+        for k in self.required[tag]:
+            if k not in attrib:
+                res.append(u"<{}> needs attribute {}".format(tag, k))
+        return res
+
+    def validatefile(self, fname):
+        """Returns a list of (line, problem) for an LDML file, reading it as a stream"""
+        res = []
+        stack = []          # [tag, children, hastext, line]
+        parser = xml.parsers.expat.ParserCreate()
+        def start(tag, attrib):
+            if len(stack):
+                top = stack[-1]
+                top[1].append(tag + " ")
+                if top[0] is None:
+                    stack.append([None, [], False, 0])
+                    return
+            elif tag != 'ldml':
+                res.append((parser.CurrentLineNumber, u"root element is <{}>, not <ldml>".format(tag)))
+            if _foreign(tag) or self.elements.get(tag, (True,))[0] is None:
+                stack.append([None, [], False, 0])      # not checked inside
+                if not _foreign(tag):
+                    res.extend((parser.CurrentLineNumber, p) for p in self.check(tag, attrib, "", False))
+            else:
+                stack.append([tag, [], False, parser.CurrentLineNumber, attrib])
+        def end(tag):
+            e = stack.pop()
+            if e[0] is not None:
+                res.extend((e[3], p) for p in self.check(e[0], e[4], "".join(e[1]), e[2]))
+        def chars(data):
+            if len(stack) and not stack[-1][2] and data.strip():
+                stack[-1][2] = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = chars
+        parser.buffer_text = True
+        try:
+            with open(fname, 'rb') as fh:
+                parser.ParseFile(fh)
+        except xml.parsers.expat.ExpatError as e:
+            res.append((e.lineno, u"not well formed: {}".format(xml.parsers.expat.ErrorString(e.code))))
+        return res
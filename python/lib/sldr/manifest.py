@@ -0,0 +1,124 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, json, hashlib
+from ldml import findldml
+
+def filehash(fname):
+    """Returns the sha1 hex digest of the contents of a file"""
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+def ldmldatafiles():
+    """Returns the CLDR data files that Ldml reads its structural information from"""
+    d = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(d, f) for f in ('supplementalData.xml', 'supplementalMetadata.xml', 'ldml.dtd')]
+
+
+class Manifest(object):
+    """ Records which input locales each output of a run depended on, together with
+        the content hash of each input file. A later run with the same options need
+        only rebuild the outputs where one of those hashes has changed.
+        options is any json serialisable value describing how the outputs were made.
+        The content hashes of datafiles, by default those of ldmldatafiles(), are kept with
+        the options, as changing one can change any output.
+        A run over one shard sets shard to the locales it was given, for merge(). """
+
+    def __init__(self, fname, dirs, options=None, datafiles=None):
+        self.fname = fname
+        self.dirs = dirs
+        self.options = options
+        if datafiles is None:
+            datafiles = ldmldatafiles()
+        self.data = dict((os.path.basename(f), filehash(f)) for f in datafiles if os.path.exists(f))
+        self.outputs = {}
+        self.hashes = {}
+        self.shard = None
+        if fname is not None and os.path.exists(fname):
+            with open(fname) as f:
+                data = json.load(f)
+            if data.get('options') == options and data.get('data') == self.data:
+                self.outputs = data.get('outputs', {})
+
+    def hash(self, lname):
+        """Returns the content hash of the input file for lname, or None if there isn't one"""
+        if lname not in self.hashes:
+            f = findldml(lname, self.dirs)
+            self.hashes[lname] = filehash(f) if f is not None else None
+        return self.hashes[lname]
+
+    def uptodate(self, lname, outfile=None):
+        """Is there a record for lname whose inputs are unchanged and whose output still exists"""
+        entry = self.outputs.get(lname, None)
+        if entry is None:
+            return False
+        if entry['output'] and (outfile is None or not os.path.exists(outfile)):
+            return False
+        for k, v in entry['depends'].items():
+            if self.hash(k) != v:
+                return False
+        return True
+
+    def update(self, lname, depends, output=True):
+        """Records that lname was built from the given locales"""
+        self.outputs[lname] = {'output' : output,
+                               'depends' : dict((d, self.hash(d)) for d in depends if d)}
+
+    def save(self, fname=None):
+        if fname is None:
+            fname = self.fname
+        tmpname = fname + '.tmp'
+        with open(tmpname, 'w') as f:
+            data = {'options' : self.options, 'data' : self.data, 'outputs' : self.outputs}
+            if self.shard is not None:
+                data['shard'] = sorted(self.shard)
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.rename(tmpname, fname)
+
+    @classmethod
+    def merge(cls, fnames, fname, dirs=None):
+        """ Combines the manifests saved by runs over each shard into fname, as a run over them
+            all would have saved it. Each shard's own locales come from its manifest. """
+        res = None
+        owned = {}
+        for f in fnames:
+            with open(f) as fh:
+                data = json.load(fh)
+            if res is None:
+                res = cls(None, dirs, options=data.get('options'), datafiles=[])
+                res.data = data.get('data')
+            elif data.get('options') != res.options:
+                raise ValueError("{} was made with different options".format(f))
+            elif data.get('data') != res.data:
+                raise ValueError("{} was made with different data files".format(f))
+            for (k, v) in data.get('outputs', {}).items():
+                res.outputs.setdefault(k, v)
+            for k in data.get('shard', []):
+                if k in data.get('outputs', {}):
+                    owned[k] = data['outputs'][k]
+        res.outputs.update(owned)
+        res.save(fname)
+        return res
@@ -0,0 +1,93 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, subprocess
+
+def topcommand(vcs):
+    """Returns the command to find the top directory of the working copy"""
+    return ['hg', 'root'] if vcs == 'hg' else ['git', 'rev-parse', '--show-toplevel']
+
+def logcommand(vcs, revformat=None):
+    """ Returns the command to list every change, newest first, as a line holding
+        \\x01 revision \\x01 date, followed by the changed files, one per line, relative to
+        the top. revformat is the vcs's format for the revision, defaulting to the full hash. """
+    if vcs == 'hg':
+        return ['hg', 'log', '--template', "\x01" + (revformat or '{node}') + "\x01{isodate(date)}\n{join(files, '\\n')}\n\n"]
+    # -c lists the files a merge changed from all its parents, as in resolving a conflict
+    return ['git', '-c', 'core.quotepath=off', 'log', '-c', '--name-only', '--no-color',
+            '--pretty=format:%x01' + (revformat or '%H') + '%x01%ci', '--']
+
+def parselog(lines, top):
+    """ Returns a dict of the absolute path of each file in a log listing, as logcommand gives,
+        to (revision, date, order) of the change nearest the top of the listing. order
+        counts changes down from the top. """
+    res = {}
+    order = -1
+    for l in lines:
+        l = l.rstrip("\r\n")
+        if l.startswith("\x01"):
+            (rev, date) = l[1:].split("\x01", 1)
+            order += 1
+        elif l and order >= 0:
+            f = os.path.join(top, l)
+            if f not in res:
+                res[f] = (rev, date, order)
+    return res
+
+
+class RevisionIndex(object):
+    """ Maps each file under paths, a directory or a list of them, to the last revision that
+        changed it, and its date, from one walk of each working copy's log rather than one
+        log command per file. Build it before starting a Pool, so workers share it.
+        vcs is 'git' or 'hg'. revformat is as for logcommand.
+        git simplifies the history of the whole of paths, not of each file as git log -- file
+        does. They only differ where a merge kept some of a side branch's changes under paths
+        but threw away its change to a file, as in resolving a conflict in favour of the
+        main line: git log -- file skips that change, but it counts here if it is the newest. """
+
+    def __init__(self, paths, vcs='git', revformat=None):
+        if isinstance(paths, basestring):
+            paths = [paths]
+        tops = {}
+        for p in paths:
+            p = os.path.realpath(p)
+            top = os.path.realpath(subprocess.check_output(topcommand(vcs), cwd=p).strip())
+            tops.setdefault(top, []).append(p)
+        self.files = {}
+        for (top, p) in sorted(tops.items()):
+            cmd = logcommand(vcs, revformat) + p
+            proc = subprocess.Popen(cmd, cwd=top, stdout=subprocess.PIPE)
+            self.files.update(parselog(proc.stdout, top))
+            if proc.wait():
+                raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    def lookup(self, fname):
+        """Returns (revision, date) of the last change to fname, or None if it has none"""
+        res = self.files.get(os.path.realpath(fname), None)
+        return res[:2] if res is not None else None
+
+    def last(self, fnames):
+        """Returns (revision, date) of the last change to any of fnames, or None if none has one"""
+        res = [self.files[f] for f in map(os.path.realpath, fnames) if f in self.files]
+        return min(res, key=lambda x:x[2])[:2] if len(res) else None
@@ -0,0 +1,100 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, shutil, filecmp, codecs
+from xml.etree.ElementTree import Element, parse
+from ldml import Ldml, etwrite
+
+def parseshard(s):
+    """Returns (i, n) from a shard given as i/N, counting from 1"""
+    try:
+        (i, n) = (int(x) for x in s.split('/'))
+    except ValueError:
+        raise ValueError("Shard {} is not of the form i/N".format(s))
+    if not 0 < i <= n:
+        raise ValueError("Shard {} is not one of 1/{} to {}/{}".format(s, n, n, n))
+    return (i, n)
+
+def families(locales):
+    """ Returns the locales grouped into families that inherit from each other: those with the
+        same language, joined with those their parentLocales name. root is on its own. """
+    if not hasattr(Ldml, 'parentLocales'):
+        Ldml.ReadSupplementalData()
+    group = {}          # language to the set of languages in its family
+    def join(a, b):
+        ga = group.setdefault(a, set([a]))
+        gb = group.setdefault(b, set([b]))
+        if ga is not gb:
+            ga.update(gb)
+            for x in gb:
+                group[x] = ga
+    for l in locales:
+        lang = l.split('_')[0]
+        join(lang, lang)
+        for p in Ldml.parentLocales.get(l, []):
+            if p != 'root':
+                join(lang, p.split('_')[0])
+    res = {}
+    for l in locales:
+        key = min(group[l.split('_')[0]])
+        res.setdefault(key, []).append(l)
+    return sorted(sorted(f) for f in res.values())
+
+def shardlocales(locales, i, n):
+    """ Returns the sorted locales of shard i of n. Whole families go to a shard, the largest first,
+        each to the shard with fewest locales so far. The same locales always give the same shards. """
+    shards = [[] for x in range(n)]
+    for f in sorted(families(locales), key=lambda x:(-len(x), x[0])):
+        min(shards, key=len).extend(f)
+    return sorted(shards[i-1])
+
+def mergetree(srcdirs, destdir):
+    """ Copies every file under each of srcdirs to the same place under destdir, replacing what
+        an earlier run left there. A file in more than one of srcdirs must be the same in each,
+        as blobs are, since shards make different outputs. """
+    files = {}
+    for srcdir in srcdirs:
+        for (dp, dn, fn) in os.walk(srcdir):
+            for f in fn:
+                s = os.path.join(dp, f)
+                r = os.path.relpath(s, srcdir)
+                if r not in files:
+                    files[r] = s
+                elif not filecmp.cmp(files[r], s, shallow=False):
+                    raise ValueError("{} and {} differ".format(files[r], s))
+    for (r, s) in sorted(files.items()):
+        t = os.path.join(destdir, r)
+        if not os.path.exists(os.path.dirname(t)):
+            os.makedirs(os.path.dirname(t))
+        shutil.copyfile(s, t)
+
+def mergeprivate(fnames, fname):
+    """Combines the private files of shards into one, with the locales in order"""
+    res = Element('private')
+    for f in fnames:
+        res.extend(parse(f).getroot())
+    res[:] = sorted(res, key=lambda e:e.get('id'))
+    outfh = codecs.open(fname, "w", encoding="utf-8")
+    etwrite(res, outfh.write)
+    outfh.close()
@@ -0,0 +1,169 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+import os, sys, codecs, resource, traceback, cPickle
+from multiprocessing import Process, Queue, cpu_count
+from Queue import Empty
+from collections import OrderedDict
+
+def _status(field):
+    """Returns a size field of /proc/self/status in bytes, or None where there is no /proc"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    return None
+
+def _maxrss():
+    res = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return res if sys.platform == 'darwin' else res * 1024
+
+def rss():
+    """Returns the memory this process has resident now, in bytes"""
+    res = _status('VmRSS')
+    return res if res is not None else _maxrss()
+
+def peakrss():
+    """Returns the most memory this process has had resident since resetpeak(), in bytes"""
+    res = _status('VmHWM')
+    return res if res is not None else _maxrss()
+
+def resetpeak():
+    """ Starts peakrss() again from what is resident now. Returns False where that cannot be
+        done (other than on Linux), leaving peakrss() the peak since the process started. """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except IOError:
+        return False
+
+class MemoryMeter(object):
+    """ The peak resident memory of a process in each phase of its work on one task.
+        Create one as the task starts and mark() the end of each phase. A phase met
+        more than once keeps its highest peak. """
+
+    def __init__(self):
+        self.peaks = OrderedDict()
+        resetpeak()
+
+    def mark(self, phase):
+        self.peaks[phase] = max(self.peaks.get(phase, 0), peakrss())
+        resetpeak()
+
+def writereport(fname, peaks):
+    """ Writes the peaks of (name, MemoryMeter.peaks) pairs as tab separated lines of
+        name, phase and megabytes, followed by the highest of each phase, named *. """
+    most = OrderedDict()
+    with codecs.open(fname, "w", encoding="utf-8") as f:
+        f.write(u"locale\tphase\tpeak_mb\n")
+        for (name, p) in sorted(peaks):
+            for (phase, v) in p.items():
+                f.write(u"{}\t{}\t{:.1f}\n".format(name, phase, v / 1048576.))
+                most[phase] = max(most.get(phase, 0), v)
+        for (phase, v) in most.items():
+            f.write(u"*\t{}\t{:.1f}\n".format(phase, v / 1048576.))
+
+def _work(fn, tasks, results, maxtasks, maxmem):
+    done = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        (i, x) = task
+        try:
+            res = (True, fn(x))
+        except Exception, e:
+            res = (False, e)
+        try:        # here, since the queue drops what it cannot pickle
+            res = cPickle.dumps(res, -1)
+        except Exception:
+            res = cPickle.dumps((False, RuntimeError(traceback.format_exc())), -1)
+        done += 1
+        retire = (maxtasks and done >= maxtasks) or (maxmem and rss() > maxmem)
+        results.put((i, res, os.getpid(), retire))
+        if retire:
+            break
+
+class WorkerPool(object):
+    """ Forked worker processes, like multiprocessing.Pool, each of which is replaced by a
+        fresh fork of the parent once it has done maxtasks tasks or holds more than maxmem
+        bytes after a task. Load what workers share before calling map(). """
+
+    def __init__(self, processes=None, maxtasks=None, maxmem=None):
+        self.processes = processes or cpu_count()
+        self.maxtasks = maxtasks
+        self.maxmem = maxmem
+        self.retired = 0
+
+    def map(self, fn, items):
+        """ Returns [fn(x) for x in items], calculated by the workers. An exception in fn is
+            raised here, as is a worker ending without retiring, as when the system kills it,
+            and one that cannot be pickled, or a result that cannot, as a RuntimeError. """
+        items = list(items)
+        tasks = Queue()
+        results = Queue()
+        for t in enumerate(items):
+            tasks.put(t)
+        workers = {}
+        def start():
+            p = Process(target=_work, args=(fn, tasks, results, self.maxtasks, self.maxmem))
+            p.daemon = True
+            p.start()
+            workers[p.pid] = p
+        for i in range(min(self.processes, len(items))):
+            tasks.put(None)
+            start()
+        res = [None] * len(items)
+        got = 0
+        try:
+            while got < len(items):
+                try:
+                    (i, r, pid, retire) = results.get(True, 1)
+                except Empty:
+                    for p in workers.values():
+                        if p.exitcode not in (None, 0):
+                            raise RuntimeError("Worker {} ended with exit code {}".format(p.pid, p.exitcode))
+                    if all(p.exitcode is not None for p in workers.values()):
+                        raise RuntimeError("Workers ended with {} results outstanding".format(len(items) - got))
+                    continue
+                r = cPickle.loads(r)
+                if not r[0]:
+                    raise r[1]
+                res[i] = r[1]
+                got += 1
+                if retire:
+                    workers.pop(pid).join()
+                    self.retired += 1
+                    start()
+            for p in workers.values():
+                p.join()
+        finally:
+            for p in workers.values():
+                if p.is_alive():
+                    p.terminate()
+        return res
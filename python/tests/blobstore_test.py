@@ -0,0 +1,106 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+try:
+    from sldr.ldml import Ldml, flattenlocale
+    from sldr.blobstore import BlobStore
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml import Ldml, flattenlocale
+    from sldr.blobstore import BlobStore
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+def serialize(ldml):
+    res = StringIO()
+    ldml.serialize_xml(res.write, topns=False)
+    return res.getvalue()
+
+def countfiles(d):
+    return sum(len(fn) for (dp, dn, fn) in os.walk(d))
+
+
+class BlobStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.blobdir = os.path.join(self.tmpdir, 'blobs')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def outfile(self, lname):
+        return os.path.join(self.tmpdir, lname + '.json')
+
+    def test_flattened(self):
+        store = BlobStore(self.blobdir)
+        expected = {}
+        for l in ('en_GB', 'en_AU'):
+            curr = flattenlocale(l, dirs=[sldrdir], flattencollation=True)
+            curr.normalise()
+            expected[l] = serialize(curr)
+            store.save(curr, self.outfile(l))
+            if l == 'en_GB':
+                blobs = countfiles(self.blobdir)
+        self.assertTrue(countfiles(self.blobdir) < 2 * blobs)
+        self.assertTrue(os.path.getsize(self.outfile('en_AU')) * 20 < len(expected['en_AU']))
+        reader = BlobStore(self.blobdir)
+        gb = reader.load(self.outfile('en_GB'))
+        au = reader.load(self.outfile('en_AU'))
+        self.assertEqual(serialize(gb), expected['en_GB'])
+        self.assertEqual(serialize(au), expected['en_AU'])
+        shared = set(id(e) for e in gb.root.iter() if e.frozen)
+        self.assertTrue(len(shared))
+        self.assertTrue(any(id(e) in shared for e in au.root.iter()))
+
+    def test_details(self):
+        l = Ldml(StringIO(u'''<ldml xmlns:sil="urn://www.sil.org/ldml/0.1"><!-- lead --><identity>
+            <special><sil:identity uid="x1" draft="contributed"/></special></identity>
+            <localeDisplayNames><languages><language type="fr">fran\u00e7ais</language>
+            <language type="fr" alt="proposed-1" draft="unconfirmed">Fran\u00e7ais</language>
+            <language type="de" draft="approved">allemand &amp; &lt;x&gt;</language><!-- after -->
+            </languages></localeDisplayNames></ldml>'''.encode('utf-8')))
+        store = BlobStore(self.blobdir, minsize=1)
+        store.save(l, self.outfile('x'))
+        blobs = countfiles(self.blobdir)
+        store.save(l, self.outfile('x'))
+        self.assertEqual(countfiles(self.blobdir), blobs)
+        res = BlobStore(self.blobdir).load(self.outfile('x'))
+        self.assertEqual(serialize(res), serialize(l))
+        self.assertEqual(res.default_draft, 'contributed')
+        self.assertEqual(res.root.find('localeDisplayNames/languages/language[@type="fr"]').text, u'fran\u00e7ais')
+
+
+if __name__ == '__main__':
+    unittest.main()
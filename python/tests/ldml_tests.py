@@ -1,13 +1,20 @@
 #!/usr/bin/python
 
-import unittest, sys, os
+import unittest, sys, os, shutil, tempfile, subprocess, pickle
 from StringIO import StringIO
 
 try:
-    from sldr.ldml import Ldml, draftratings
+    from sldr.ldml import Ldml, LdmlCache, LdmlStage, FlatAncestors, Interner, CollationIndex, flattenlocale, findldml, draftratings, mostinherited
 except ImportError:
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
-    from sldr.ldml import Ldml, draftratings
+    from sldr.ldml import Ldml, LdmlCache, LdmlStage, FlatAncestors, Interner, CollationIndex, flattenlocale, findldml, draftratings, mostinherited
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+def serialize(ldml):
+    res = StringIO()
+    ldml.serialize_xml(res.write)
+    return res.getvalue()
 
 
 class LDMLTests(unittest.TestCase):
@@ -67,6 +74,485 @@ class LDMLTests(unittest.TestCase):
         self.assertTrue(b.text == self.teststrs['generated'])
         self.assertTrue(id(b) == id(e))
 
+    def test_dirty_normalise(self):
+        chars = self.ldml.root.find('characters')
+        identity = self.ldml.root.find('identity')
+        self.assertTrue(self.ldml.root.normalised is not None)
+        oldhash = chars.contentHash
+        e = self.ldml.ensure_path('characters/ellipsis[@type="final"]')[0]
+        e.text = u"{0}\u2026"
+        self.assertTrue(self.ldml.root.normalised is None)
+        self.assertTrue(identity.normalised is not None)
+        self.assertTrue(chars.contentHash != oldhash)
+        self.ldml.ensure_path('characters/exemplarCharacters[@type="auxiliary"]')
+        self.ldml.normalise()
+        self.assertTrue(chars.normalised is not None)
+        self.assertEqual([c.tag for c in chars], ['exemplarCharacters', 'exemplarCharacters', 'ellipsis'])
+        self.assertEqual(chars[0].get('type'), 'auxiliary')
+
+    def test_id_order(self):
+        ids = ['10a', '9', '10', '-x', 'b', '9.5']
+        for order in (ids, list(reversed(ids))):
+            l = Ldml(StringIO('<ldml><segmentations><segmentation type="x"><segmentRules>' +
+                    ''.join('<rule id="{}">x</rule>'.format(i) for i in order) +
+                    '</segmentRules></segmentation></segmentations></ldml>'))
+            l.normalise()
+            rules = l.root.find('segmentations/segmentation/segmentRules')
+            self.assertEqual([r.get('id') for r in rules], ['-x', '9', '9.5', '10', '10a', 'b'])
+
+    def test_indexed_lookup(self):
+        path = 'localeDisplayNames/languages/language[@type="{}"]'
+        for i in range(40):
+            self.ldml.ensure_path(path.format("x%02d" % i))[0].text = str(i)
+        langs = self.ldml.root.find('localeDisplayNames/languages')
+        self.assertEqual(self.ldml.find(path.format("x17")).text, "17")
+        self.ldml.find(path.format("x17")).set('type', 'y17')
+        self.assertTrue(self.ldml.find(path.format("x17")) is None)
+        self.assertEqual(self.ldml.ensure_path(path.format("y17"))[0].text, "17")
+        self.ldml.find(path.format("x20")).attrib['type'] = 'y20'
+        self.assertTrue(self.ldml.find(path.format("x20")) is None)
+        self.assertEqual(self.ldml.find(path.format("y20")).text, "20")
+        del self.ldml.find(path.format("y20")).attrib['type']
+        self.assertTrue(self.ldml.find(path.format("y20")) is None)
+        langs.remove(self.ldml.find(path.format("x18")))
+        self.assertTrue(self.ldml.find(path.format("x18")) is None)
+        self.assertEqual(len(langs.findall('language')), 39)
+        self.ldml.ensure_path(path.format("x18"))
+        self.assertEqual(len(langs), 40)
+        self.assertEqual(self.ldml.ensure_path(path.format("x05"))[0].text, "5")
+
+    def test_comments(self):
+        l = Ldml(StringIO('<ldml><!-- lead --><identity><version number="1"/></identity>'
+                          '<characters><exemplarCharacters>[a]</exemplarCharacters><!-- trail --></characters></ldml>'))
+        self.assertEqual(l.root.find('identity').comments, [' lead '])
+        chars = l.root.find('characters')
+        self.assertEqual(chars[0].commentsafter, [' trail '])
+        self.assertEqual(chars[0].text, '[a]')
+        self.assertTrue(chars[0].parent is chars and chars[0].document is l)
+        self.assertEqual(len(l.root.findall('*')), 2)
+
+
+class AlignTests(unittest.TestCase):
+
+    def _ldml(self, start, end, text):
+        res = ['<ldml><localeDisplayNames><languages>']
+        for i in range(start, end):
+            res.append('<language type="x{0:02d}">{1}{0}</language>'.format(i, text(i)))
+        res.append('</languages></localeDisplayNames></ldml>')
+        return Ldml(StringIO("".join(res)))
+
+    def _langs(self, ldml):
+        return [(e.get('type'), e.text) for e in ldml.root.find('localeDisplayNames/languages')]
+
+    def test_overlay(self):
+        this = self._ldml(0, 40, lambda i: "a")
+        this.overlay(self._ldml(20, 60, lambda i: "b"), copy=True)
+        langs = self._langs(this)
+        self.assertEqual(len(langs), 60)
+        self.assertEqual(langs[25], ('x25', 'a25'))
+        self.assertEqual(langs[45], ('x45', 'b45'))
+
+    def test_difference(self):
+        this = self._ldml(0, 40, lambda i: "a")
+        this.difference(self._ldml(20, 60, lambda i: "b" if i % 2 else "a"))
+        langs = self._langs(this)
+        self.assertEqual(len(langs), 30)
+        self.assertEqual(langs[20:], [('x%02d' % i, 'a%d' % i) for i in range(21, 40, 2)])
+
+
+class AliasTests(unittest.TestCase):
+
+    def _ldml(self, calendars):
+        return Ldml(StringIO('<ldml><dates><calendars>' + calendars + '</calendars></dates></ldml>'))
+
+    def test_resolve(self):
+        alias = '<calendar type="{}"><months><alias source="locale" path="../../calendar[@type=\'gregorian\']/months"/></months></calendar>'
+        l = self._ldml('<calendar type="gregorian"><months><monthContext type="format">'
+                       '<monthWidth type="abbreviated"><alias source="locale" path="../monthWidth[@type=\'wide\']"/></monthWidth>'
+                       '<monthWidth type="wide"><month type="1">Jan</month></monthWidth>'
+                       '</monthContext></months></calendar>' + alias.format('buddhist') + alias.format('coptic'))
+        l.resolve_aliases()
+        l.normalise()
+        self.assertTrue(l.root.find('.//alias') is None)
+        for c in ('buddhist', 'coptic', 'gregorian'):
+            for w in ('abbreviated', 'wide'):
+                path = 'dates/calendars/calendar[@type="{}"]/months/monthContext/monthWidth[@type="{}"]/month'.format(c, w)
+                self.assertEqual(l.root.find(path).text, 'Jan')
+        path = 'dates/calendars/calendar[@type="{}"]/months/monthContext/monthWidth[@type="wide"]/month'
+        for c in ('buddhist', 'coptic', 'gregorian'):
+            l.ensure_path(path.format(c))[0].text = c
+            for o in ('buddhist', 'coptic', 'gregorian'):
+                self.assertEqual(l.root.find(path.format(o)).text, o if o == c else 'Jan')
+            l.ensure_path(path.format(c))[0].text = 'Jan'
+
+    def test_inherited(self):
+        root = self._ldml('<calendar type="buddhist"><months><alias source="locale" path="../../calendar[@type=\'gregorian\']/months"/></months></calendar>'
+                          '<calendar type="gregorian"><months><monthContext type="format"><monthWidth type="wide">'
+                          '<month type="1">M01</month><month type="2">M02</month></monthWidth></monthContext></months></calendar>')
+        l = self._ldml('<calendar type="gregorian"><months><monthContext type="format"><monthWidth type="wide">'
+                       '<month type="1">Jan</month></monthWidth></monthContext></months></calendar>')
+        l.overlay(root, copy=False)
+        l.resolve_aliases()
+        path = 'dates/calendars/calendar[@type="buddhist"]/months/monthContext/monthWidth[@type="wide"]/month[@type="{}"]'
+        self.assertEqual([l.root.find(path.format(m)).text for m in ('1', '2')], ['Jan', 'M02'])
+
+    def test_loop(self):
+        l = Ldml(StringIO('<ldml><a><alias source="locale" path=".."/><a><b><a/></b></a></a><b><alias source="locale" path="../.."/>'
+                          '<b><alias source="locale" path="../a"/><a><b/></a></b></b></ldml>'))
+        l.fname = 'loop'
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            l.resolve_aliases()
+            self.assertTrue('Alias loop' in sys.stdout.getvalue())
+        finally:
+            sys.stdout = stdout
+
+
+class LazyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fname = os.path.join(os.path.dirname(__file__), 'test1b.xml')
+
+    def test_lazy(self):
+        full = Ldml(self.fname)
+        lazy = Ldml(self.fname, lazy=True)
+        self.assertEqual([e.tag for e in lazy.root], [e.tag for e in full.root])
+        self.assertTrue(lazy.root.find('layout') in lazy._sections)
+        self.assertEqual(lazy.root.find('identity/language').get('type'), 'aai')
+        self.assertEqual(serialize(lazy), serialize(full))
+        self.assertEqual(lazy.root.contentHash, full.root.contentHash)
+
+    def test_sections(self):
+        part = Ldml(self.fname, sections=['identity', 'characters'])
+        self.assertEqual(set(e.tag for e in part.root), set(['identity', 'characters']))
+        self.assertEqual(part.uid, "")
+        full = Ldml(self.fname)
+        for e in ('identity', 'characters'):
+            self.assertEqual(part.root.find(e).contentHash, full.root.find(e).contentHash)
+
+
+class LDMLCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fname = os.path.join(os.path.dirname(__file__), 'test1b.xml')
+
+    def tearDown(self):
+        Ldml.cache = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        orig = Ldml(self.fname)
+        Ldml.cache = LdmlCache(self.tmpdir)
+        Ldml(self.fname)
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+        cached = Ldml(self.fname)
+        self.assertEqual(cached.root.contentHash, orig.root.contentHash)
+        self.assertEqual(serialize(cached), serialize(orig))
+
+    def test_corrupt(self):
+        orig = Ldml(self.fname)
+        Ldml.cache = LdmlCache(self.tmpdir)
+        Ldml(self.fname)
+        cname = os.path.join(self.tmpdir, os.listdir(self.tmpdir)[0])
+        with open(cname, 'rb') as fh:
+            header = pickle.load(fh)
+        for body in ((1,), ({}, ('ldml',)), None):
+            with open(cname, 'wb') as fh:
+                pickle.dump(header, fh, 2)
+                if body is not None:
+                    pickle.dump(body, fh, 2)
+                else:
+                    fh.write('\x80\x02cnosuchmodule\nx\n.')
+            self.assertEqual(serialize(Ldml(self.fname)), serialize(orig))
+        with open(cname, 'r+b') as fh:
+            fh.truncate(os.path.getsize(cname) // 2)
+        self.assertEqual(serialize(Ldml(self.fname)), serialize(orig))
+        self.assertEqual(serialize(Ldml(self.fname)), serialize(orig))
+
+    def test_changed(self):
+        fname = os.path.join(self.tmpdir, 'test.xml')
+        shutil.copyfile(self.fname, fname)
+        Ldml.cache = LdmlCache(os.path.join(self.tmpdir, 'cache'))
+        Ldml(fname)
+        with open(fname) as fh:
+            text = fh.read()
+        with open(fname, 'w') as fh:
+            fh.write(text.replace('>Metric<', '>Metrix<'))     # same size, only the mtime tells
+        st = os.stat(fname)
+        os.utime(fname, (st.st_atime, st.st_mtime + 10))
+        res = Ldml(fname)
+        self.assertEqual(res.root.find('localeDisplayNames/measurementSystemNames/measurementSystemName[@type="metric"]').text, 'Metrix')
+
+    def test_datachanged(self):
+        datafile = os.path.join(self.tmpdir, 'ldml.dtd')
+        shutil.copyfile(os.path.join(os.path.dirname(__file__), '..', 'lib', 'sldr', 'ldml.dtd'), datafile)
+        Ldml.cache = LdmlCache(os.path.join(self.tmpdir, 'cache'), datafiles=[datafile])
+        Ldml(self.fname)
+        self.assertTrue(Ldml.cache.load(Ldml(None), self.fname))
+        with open(datafile, 'a') as fh:
+            fh.write('<!-- changed -->\n')
+        LdmlCache._datahashes.clear()      # as in a new process
+        self.assertFalse(Ldml.cache.load(Ldml(None), self.fname))
+        Ldml(self.fname)
+        self.assertTrue(Ldml.cache.load(Ldml(None), self.fname))
+
+
+class StableHashTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fname = os.path.join(os.path.dirname(__file__), 'test1b.xml')
+        Ldml.stablehashes = True
+
+    def tearDown(self):
+        Ldml.stablehashes = False
+
+    def test_crossprocess(self):
+        local = Ldml(self.fname).root.contentHash.hashed
+        libdir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib'))
+        prog = "import sys; sys.path.insert(0, {!r}); from sldr.ldml import Ldml; Ldml.stablehashes = True; " \
+               "print Ldml({!r}).root.contentHash.hashed".format(libdir, self.fname)
+        for i in range(2):
+            remote = subprocess.check_output([sys.executable, '-R', '-c', prog])
+            self.assertEqual(int(remote), local)
+
+
+class FlattenTests(unittest.TestCase):
+
+    def _flatten(self, lname, **kw):
+        res = flattenlocale(lname, dirs=[sldrdir], **kw)
+        res.normalise()
+        return serialize(res)
+
+    def test_ancestors(self):
+        ancestors = FlatAncestors([sldrdir])
+        self.assertEqual(self._flatten('en_GB', ancestors=ancestors), self._flatten('en_GB'))
+        parent = serialize(ancestors.get('en_001'))
+        self.assertEqual(self._flatten('en_AU', ancestors=ancestors), self._flatten('en_AU'))
+        self.assertEqual(serialize(ancestors.get('en_001')), parent)
+
+    def test_preload(self):
+        lnames = ['en_GB', 'en_AU', 'en_US', 'fr_CA', 'fr_FR']
+        self.assertEqual(mostinherited(lnames), ['root', 'en'])
+        self.assertEqual(mostinherited(lnames, 0.25), ['root', 'en', 'en_001', 'fr'])
+        ancestors = FlatAncestors([sldrdir]).preload(lnames)
+        self.assertEqual(sorted(ancestors.pinned), ['en', 'root'])
+        self.assertEqual(self._flatten('en_GB', ancestors=ancestors), self._flatten('en_GB'))
+        self.assertTrue(ancestors.get('en') is ancestors.pinned['en'][0])
+
+    def test_stage(self):
+        made = []
+        def fn(lname):
+            made.append(lname)
+            f = findldml(lname, [sldrdir])
+            return Ldml(f) if f is not None else None
+        stage = LdmlStage(fn, ['root', 'en', 'en_001', 'en_GB', 'en_AU'])
+        for l in ('en_GB', 'en_AU'):
+            res = flattenlocale(stage.getldml(l), fname=l, dirs=stage, ancestors=FlatAncestors(stage))
+            res.normalise()
+            self.assertEqual(serialize(res), self._flatten(l))
+        self.assertEqual(len(made), len(set(made)))
+        self.assertEqual(stage.getldml('fr'), None)
+        flat = LdmlStage(lambda l: flattenlocale(l, dirs=[sldrdir]), ['root', 'en', 'en_001', 'en_GB'])
+        res = flattenlocale(flat.getldml('en_GB'), fname='en_GB', dirs=flat, rev='r')
+        res.normalise()
+        self.assertEqual(serialize(res), serialize(self._unflat('en_GB')))
+
+    def _unflat(self, lname):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for l in ('root', 'en', 'en_001', 'en_GB'):
+                with open(os.path.join(tmpdir, l + '.xml'), 'w') as f:
+                    f.write(self._flatten(l).encode('utf-8'))
+            res = flattenlocale(lname, dirs=[tmpdir], rev='r')
+            res.normalise()
+            return res
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class CollationIndexTests(unittest.TestCase):
+
+    collfile = u'''<?xml version="1.0" encoding="utf-8"?>
+<ldml>
+    <identity><language type="{0}"/></identity>
+    <collations>
+        <collation type="standard"><cr><![CDATA[{1}]]></cr></collation>
+    </collations>
+</ldml>'''
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._write('xa', u'&a<b')
+        self._write('xb', u'[import xa-u-co-standard]&c<d')
+        self._write('xc', u'[import xb-u-co-standard][import xz-u-co-standard]&e<f')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, lname, rules):
+        with open(os.path.join(self.tmpdir, lname + '.xml'), 'w') as f:
+            f.write(self.collfile.format(lname, rules).encode('utf-8'))
+
+    def _flatten(self, lname, **kw):
+        l = flattenlocale(lname, dirs=[self.tmpdir], flattencollation=True, **kw)
+        return (l.root.find('collations/collation/cr').text, set(l.depends))
+
+    def test_index(self):
+        fname = os.path.join(self.tmpdir, 'index.json')
+        index = CollationIndex([self.tmpdir], fname).build()
+        self.assertEqual(index.get('xb', 'standard'), (u'&a<b&c<d', ['xb', 'xa']))
+        res = self._flatten('xc', collations=index)
+        self.assertEqual(res, self._flatten('xc'))
+        self.assertEqual(res[0], u'&a<b&c<d&e<f')
+        self.assertTrue(set(['xa', 'xb', 'xz']) <= res[1])
+        self._write('xa', u'&a<c')
+        index = CollationIndex([self.tmpdir], fname).build()
+        self.assertEqual(self._flatten('xc', collations=index)[0], u'&a<c&c<d&e<f')
+
+    def test_lazy(self):
+        fname = os.path.join(self.tmpdir, 'index.json')
+        CollationIndex([self.tmpdir], fname).build()
+        self._write('xa', u'&a<c')
+        index = CollationIndex([self.tmpdir], fname)
+        self.assertEqual(index.get('xb', 'standard'), (u'&a<c&c<d', ['xb', 'xa']))
+        self.assertEqual(set(index.files), set(['xa', 'xb']))
+        res = self._flatten('xc', collations=index)
+        self.assertEqual(res, self._flatten('xc'))
+        self.assertEqual(index.files['xz'], None)
+
+
+class InternTests(unittest.TestCase):
+
+    def setUp(self):
+        self.interner = Interner()
+        self.gb = flattenlocale('en_GB', dirs=[sldrdir])
+        self.gb.normalise()
+        self.au = flattenlocale('en_AU', dirs=[sldrdir])
+        self.au.normalise()
+        self.gbout = serialize(self.gb)
+        self.auout = serialize(self.au)
+        self.gb.intern(self.interner)
+        self.au.intern(self.interner)
+
+    def test_shared(self):
+        self.assertEqual(serialize(self.gb), self.gbout)
+        self.assertEqual(serialize(self.au), self.auout)
+        gbnodes = set(id(e) for e in self.gb.root.iter())
+        self.assertTrue(any(id(e) in gbnodes for e in self.au.root.iter()))
+        self.assertRaises(TypeError, self.gb.root.find('characters').set, 'type', 'x')
+
+    def test_alternates(self):
+        data = u'<ldml><identity><version number="1"/><language type="{}"/></identity><localeDisplayNames>' \
+               u'<languages><language type="fr">French</language><language type="fr" alt="proposed" ' \
+               u'draft="unconfirmed">Frankish</language></languages></localeDisplayNames></ldml>'
+        path = 'localeDisplayNames/languages/language[@type="fr"]'
+        for (draft, matchdraft) in ((None, 'alt'), ('unconfirmed', 'both'), ('unconfirmed', 'draft')):
+            (xx, yy) = (Ldml(StringIO(data.format(l))) for l in ('xx', 'yy'))
+            interner = Interner()
+            for l in (xx, yy):
+                l.intern(interner)
+            self.assertTrue(xx.find('localeDisplayNames') is yy.find('localeDisplayNames'))
+            xxout = serialize(xx)
+            res = yy.ensure_path(path, alt='proposed', draft=draft, matchdraft=matchdraft)
+            self.assertEqual([e.text for e in res], ['Frankish'])
+            res[0].text = 'Gaulish'
+            self.assertEqual(len(yy.find('localeDisplayNames/languages')), 1)
+            self.assertTrue('alt="proposed">Gaulish<' in serialize(yy))
+            self.assertEqual(serialize(xx), xxout)
+
+    def test_copyonwrite(self):
+        path = 'characters/exemplarCharacters[@type="punctuation"]'
+        self.assertTrue(self.gb.find(path) is self.au.find(path))
+        e = self.gb.ensure_path(path)[0]
+        e.text = "[!]"
+        self.assertTrue(self.gb.find(path) is not self.au.find(path))
+        self.assertEqual(serialize(self.au), self.auout)
+        self.assertTrue('>[!]<' in serialize(self.gb))
+        other = Ldml(None)
+        other.ensure_path('characters/ellipsis[@type="final"]')[0].text = u"{0}\u2026!"
+        gbout = serialize(self.gb)
+        self.au.overlay(other)
+        self.au.difference(other)
+        self.assertEqual(serialize(self.au), self.auout)
+        self.assertEqual(serialize(self.gb), gbout)
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.gb = flattenlocale('en_GB', dirs=[sldrdir])
+        self.gb.normalise()
+        self.gbout = serialize(self.gb)
+
+    def test_snapshot(self):
+        path = 'localeDisplayNames/languages/language[@type="fr"]'
+        snap = self.gb.snapshot()
+        self.assertEqual(serialize(snap), self.gbout)
+        e = snap.ensure_path(path)[0]
+        e.text = "Frankish"
+        self.assertEqual(serialize(self.gb), self.gbout)
+        self.assertTrue(snap.find('characters') is self.gb.find('characters'))
+        self.assertEqual(sum(1 for x in snap.root.iter() if not x.frozen), 4)
+        self.assertRaises(TypeError, self.gb.root.find('characters').set, 'type', 'x')
+        shared = snap.find('localeDisplayNames/languages/language[@type="de"]')
+        before = shared.text
+        for (a, v) in (('text', 'X'), ('tail', 'X'), ('comments', ['X'])):
+            self.assertRaises(TypeError, setattr, shared, a, v)
+        self.assertRaises(TypeError, shared.attrib.__setitem__, 'type', 'x')
+        self.assertRaises(TypeError, shared.attrib.pop, 'type')
+        self.assertEqual(self.gb.find('localeDisplayNames/languages/language[@type="de"]').text, before)
+        self.assertEqual(serialize(self.gb), self.gbout)
+        e = self.gb.ensure_path(path)[0]
+        e.text = "Gaulish"
+        self.assertEqual(snap.find(path).text, "Frankish")
+        self.assertEqual(self.gb.find(path).text, "Gaulish")
+
+    def test_aliases(self):
+        ancestors = FlatAncestors([sldrdir])
+        path = 'dates/calendars/calendar[@type="buddhist"]/months/monthContext[@type="format"]/monthWidth[@type="narrow"]'
+        res = []
+        for a in (ancestors, None):
+            l = flattenlocale('twq_NE', dirs=[sldrdir], ancestors=a)
+            l.resolve_aliases()
+            l.normalise()
+            self.assertEqual(len(l.find(path)), 12)
+            res.append(serialize(l))
+        self.assertEqual(res[0], res[1])
+
+    def test_filter_drafts(self):
+        snap = self.gb.snapshot()
+        self.assertTrue(snap.filter_drafts('approved'))
+        self.assertEqual(serialize(self.gb), self.gbout)
+        limit = draftratings['approved']
+        for c in snap.root:
+            if c.tag == 'identity': continue
+            for e in c.iter():
+                if len(e) or e.tag == 'alias': continue
+                self.assertTrue(snap.draftrating(e) <= limit)
+                self.assertTrue(all(snap.draftrating(v) <= limit for v in getattr(e, 'alternates', {}).values()))
+        self.assertTrue(snap.find('identity') is self.gb.find('identity'))
+        self.assertFalse(snap.filter_drafts('approved'))
+
+    def test_settle_drafts(self):
+        snap = self.gb.snapshot()
+        snap.add_silidentity(draft='contributed')
+        out = serialize(snap)
+        back = Ldml(StringIO(out.encode('utf-8')))
+        snap.settle_drafts()
+        self.assertEqual(snap.default_draft, 'contributed')
+        self.assertEqual(serialize(snap), serialize(back))
+        self.assertNotEqual(serialize(snap), out)
+        self.assertEqual(serialize(self.gb), self.gbout)
+
+    def test_variants(self):
+        base = flattenlocale('en_GB', dirs=[sldrdir], rev='c')
+        before = serialize(base)
+        flat = flattenlocale(base.snapshot(), fname='en_GB', dirs=[sldrdir])
+        flat.normalise()
+        self.assertEqual(serialize(flat), self.gbout)
+        self.assertEqual(serialize(base), before)
 
 if __name__ == '__main__':
     unittest.main()
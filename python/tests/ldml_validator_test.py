@@ -0,0 +1,108 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    from sldr.ldml_validator import LdmlValidator
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.ldml_validator import LdmlValidator
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+header = """<?xml version="1.0" encoding="UTF-8"?>
+<ldml xmlns:sil="urn://www.sil.org/ldml/0.1">
+    <identity>
+        <version number="$Revision$"/>
+        <language type="xx"/>
+    </identity>
+"""
+
+class LdmlValidatorTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.validator = LdmlValidator()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, body):
+        fname = os.path.join(self.tmpdir, 'xx.xml')
+        with open(fname, 'w') as fh:
+            fh.write(header + body + "</ldml>\n")
+        return self.validator.validatefile(fname)
+
+    def test_valid(self):
+        res = self.check("""    <characters>
+        <exemplarCharacters draft="generated">[a b c]</exemplarCharacters>
+        <special><sil:exemplarCharacters type="x">[d]</sil:exemplarCharacters></special>
+    </characters>
+""")
+        self.assertEqual(res, [])
+
+    def test_problems(self):
+        res = self.check("""    <characters>
+        <exemplarCharacters type="numbers" bogus="1">[a]</exemplarCharacters>
+        <ellipsis>...</ellipsis>
+        <parseLenients/>
+        <widget/>
+    </characters>
+    <delimiters>text<quotationStart>x</quotationStart></delimiters>
+""")
+        self.assertEqual(sorted(res), [
+            (7, u"unknown element <widget> in <characters>"),
+            (8, u'<exemplarCharacters type="numbers"> is not one of auxiliary currencySymbol index punctuation standard'),
+            (8, u"<exemplarCharacters> has no attribute bogus"),
+            (10, u"<parseLenients> needs attribute level"),
+            (10, u"<parseLenients> needs attribute scope"),
+            (11, u"unknown element <widget>"),
+            (13, u"<delimiters> may not hold text")])
+
+    def test_order(self):
+        res = self.check("""    <numbers>
+        <symbols><decimal>.</decimal></symbols>
+        <minimumGroupingDigits>1</minimumGroupingDigits>
+    </numbers>
+""")
+        self.assertEqual(len(res), 1)
+        self.assertTrue(res[0][1].startswith(u"<numbers> holds symbols, minimumGroupingDigits where"))
+
+    def test_sldr(self):
+        res = self.validator.validatefile(os.path.join(sldrdir, 'e', 'en.xml'))
+        self.assertFalse(any(p.startswith(u"unknown") or u"not well formed" in p for (l, p) in res))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    from sldr.manifest import Manifest
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.manifest import Manifest
+
+
+class ManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mfile = os.path.join(self.tmpdir, 'manifest.json')
+        self.outfile = os.path.join(self.tmpdir, 'out.xml')
+        for l in ('root', 'xx', 'xx_YY', self.outfile):
+            self.write(l, '<ldml/>')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, lname, text):
+        with open(os.path.join(self.tmpdir, lname + '.xml' if lname[0] != '/' else lname), 'w') as f:
+            f.write(text)
+
+    def record(self):
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1})
+        m.update('xx_YY', ['xx_YY', 'xx_Zzzz', 'xx', 'root'])
+        m.save()
+
+    def test_unchanged(self):
+        self.record()
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1})
+        self.assertTrue(m.uptodate('xx_YY', self.outfile))
+        self.assertFalse(m.uptodate('xx', self.outfile))
+
+    def test_ancestor_changed(self):
+        self.record()
+        self.write('root', '<ldml><identity/></ldml>')
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1})
+        self.assertFalse(m.uptodate('xx_YY', self.outfile))
+
+    def test_ancestor_added(self):
+        self.record()
+        self.write('xx_Zzzz', '<ldml/>')
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1})
+        self.assertFalse(m.uptodate('xx_YY', self.outfile))
+
+    def test_options_changed(self):
+        self.record()
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 2})
+        self.assertFalse(m.uptodate('xx_YY', self.outfile))
+
+    def test_data_changed(self):
+        data = os.path.join(self.tmpdir, 'supplementalData.xml')
+        self.write(data, '<supplementalData/>')
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1}, datafiles=[data])
+        m.update('xx_YY', ['xx_YY', 'root'])
+        m.save()
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1}, datafiles=[data])
+        self.assertTrue(m.uptodate('xx_YY', self.outfile))
+        self.write(data, '<supplementalData><version/></supplementalData>')
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1}, datafiles=[data])
+        self.assertFalse(m.uptodate('xx_YY', self.outfile))
+
+    def test_merge(self):
+        self.record()
+        shards = []
+        for (i, l) in enumerate(('xx', 'xx_YY')):
+            m = Manifest(self.mfile, [self.tmpdir], options={'a' : 1})
+            m.shard = [l]
+            m.update(l, [l, 'root'])
+            shards.append(os.path.join(self.tmpdir, 'shard{}.json'.format(i)))
+            m.save(shards[-1])
+        merged = Manifest.merge(shards, os.path.join(self.tmpdir, 'merged.json'))
+        self.assertEqual(sorted(merged.outputs['xx_YY']['depends'].keys()), ['root', 'xx_YY'])
+        m = Manifest(os.path.join(self.tmpdir, 'merged.json'), [self.tmpdir], options={'a' : 1})
+        self.assertTrue(m.uptodate('xx', self.outfile))
+        self.assertTrue(m.uptodate('xx_YY', self.outfile))
+        m = Manifest(self.mfile, [self.tmpdir], options={'a' : 2})
+        m.save(shards[1])
+        self.assertRaises(ValueError, Manifest.merge, shards, os.path.join(self.tmpdir, 'merged.json'))
+
+
+if __name__ == '__main__':
+    unittest.main()
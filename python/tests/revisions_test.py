@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+try:
+    from sldr.revisions import RevisionIndex, parselog
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.revisions import RevisionIndex, parselog
+
+def hasgit():
+    try:
+        subprocess.check_output(['git', '--version'])
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+@unittest.skipUnless(hasgit(), "needs git")
+class RevisionIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = os.path.realpath(tempfile.mkdtemp())
+        self.indir = os.path.join(self.tmpdir, 'sldr')
+        os.makedirs(os.path.join(self.indir, 'e'))
+        os.makedirs(os.path.join(self.indir, 'f'))
+        self.git('init', '-q')
+        self.commit({'sldr/e/en.xml' : 'a', 'sldr/f/fr.xml' : 'a', 'README' : 'a'}, 1)
+        self.commit({'sldr/f/fr.xml' : 'b', 'README' : 'b'}, 2)
+        self.commit({'sldr/e/en_GB.xml' : 'a'}, 3)
+        self.commit({'README' : 'c'}, 4)
+        with open(os.path.join(self.indir, 'f', 'fr_CA.xml'), 'w') as fh:
+            fh.write('untracked')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def git(self, *args, **kw):
+        env = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.org',
+                   GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.org', **kw)
+        return subprocess.check_output(['git'] + list(args), cwd=self.tmpdir, env=env)
+
+    def commit(self, files, day):
+        for (f, t) in files.items():
+            with open(os.path.join(self.tmpdir, f), 'w') as fh:
+                fh.write(t)
+        self.git('add', *files.keys())
+        date = '2017-01-0{} 12:00:00 +0000'.format(day)
+        self.git('commit', '-q', '-m', str(day), GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+
+    def lastchange(self, f):
+        return tuple(self.git('log', '-n', '1', '--pretty=format:%H%n%ci', f).split("\n"))
+
+    def test_lookup(self):
+        revs = RevisionIndex(self.indir)
+        for f in ('e/en.xml', 'e/en_GB.xml', 'f/fr.xml'):
+            f = os.path.join(self.indir, f)
+            self.assertEqual(revs.lookup(f), self.lastchange(f))
+        self.assertEqual(revs.lookup(os.path.join(self.indir, 'f', 'fr_CA.xml')), None)
+        self.assertEqual(revs.lookup(os.path.join(self.tmpdir, 'README')), None)     # outside indir
+        self.assertEqual(len(revs.files), 3)
+
+    def test_last(self):
+        revs = RevisionIndex(os.path.join(self.indir, 'e'))
+        en = os.path.join(self.indir, 'e', 'en.xml')
+        gb = os.path.join(self.indir, 'e', 'en_GB.xml')
+        self.assertEqual(revs.last([en, gb]), self.lastchange(gb))
+        self.assertEqual(revs.last([en, os.path.join(self.indir, 'f', 'fr.xml')]), self.lastchange(en))
+        self.assertEqual(revs.last([]), None)
+
+    def test_merge(self):
+        self.git('checkout', '-q', '-b', 'side')
+        self.commit({'sldr/e/en.xml' : 'side', 'sldr/f/fr.xml' : 'side'}, 5)
+        self.git('checkout', '-q', '-')
+        self.commit({'sldr/f/fr.xml' : 'main'}, 6)
+        self.assertRaises(subprocess.CalledProcessError, self.git, 'merge', '-q', 'side')
+        self.commit({'sldr/f/fr.xml' : 'merged'}, 7)
+        revs = RevisionIndex(self.indir)
+        for f in ('e/en.xml', 'f/fr.xml'):
+            f = os.path.join(self.indir, f)
+            self.assertEqual(revs.lookup(f), self.lastchange(f))
+        self.assertEqual(revs.lookup(os.path.join(self.indir, 'f', 'fr.xml'))[1], '2017-01-07 12:00:00 +0000')
+
+    def test_merge_ours(self):
+        self.git('checkout', '-q', '-b', 'side')
+        self.commit({'sldr/e/en.xml' : 'side', 'sldr/f/fr.xml' : 'side'}, 6)
+        self.git('checkout', '-q', '-')
+        self.commit({'sldr/e/en.xml' : 'main'}, 5)
+        self.git('merge', '-q', '-s', 'ours', '-m', 'ours', 'side')
+        revs = RevisionIndex(self.indir)
+        for f in ('e/en.xml', 'f/fr.xml'):
+            f = os.path.join(self.indir, f)
+            self.assertEqual(revs.lookup(f), self.lastchange(f))
+        # keep fr.xml from side but en.xml from main: unlike git log -- en.xml, the index
+        # still sees side's change to en.xml, as the merge kept some of side's changes
+        self.git('checkout', '-q', 'side')
+        self.commit({'sldr/e/en.xml' : 'side2', 'sldr/f/fr.xml' : 'side2'}, 8)
+        self.git('checkout', '-q', '-')
+        self.git('merge', '-q', '--no-commit', '-s', 'ours', 'side')
+        self.commit({'sldr/f/fr.xml' : 'side2'}, 9)
+        revs = RevisionIndex(self.indir)
+        fr = os.path.join(self.indir, 'f', 'fr.xml')
+        self.assertEqual(revs.lookup(fr), self.lastchange(fr))
+        en = os.path.join(self.indir, 'e', 'en.xml')
+        self.assertEqual(self.lastchange(en)[1], '2017-01-05 12:00:00 +0000')
+        self.assertEqual(revs.lookup(en)[1], '2017-01-08 12:00:00 +0000')
+
+
+class ParseLogTests(unittest.TestCase):
+
+    def test_hg(self):
+        log = ["\x0112\x012017-01-03 12:00 +0000\n", "common/main/en.xml\n", "\n",
+               "\x0111\x012017-01-02 12:00 +0000\n", "common/main/en.xml\n", "common/main/fr.xml\n", "\n"]
+        res = parselog(log, '/cldr')
+        self.assertEqual(res, {'/cldr/common/main/en.xml' : ('12', '2017-01-03 12:00 +0000', 0),
+                               '/cldr/common/main/fr.xml' : ('11', '2017-01-02 12:00 +0000', 1)})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    from sldr.shards import parseshard, families, shardlocales, mergetree, mergeprivate
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.shards import parseshard, families, shardlocales, mergetree, mergeprivate
+
+sldrdir = os.path.join(os.path.dirname(__file__), '..', '..', 'sldr')
+
+
+class ShardTests(unittest.TestCase):
+
+    def setUp(self):
+        self.locales = sorted(f[:-4] for (dp, dn, fn) in os.walk(sldrdir) for f in fn if f.endswith('.xml'))
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse(self):
+        self.assertEqual(parseshard('2/3'), (2, 3))
+        for s in ('0/3', '4/3', '2', 'a/b'):
+            self.assertRaises(ValueError, parseshard, s)
+
+    def test_partition(self):
+        shards = [shardlocales(self.locales, i, 4) for i in range(1, 5)]
+        self.assertEqual(sorted(sum(shards, [])), self.locales)
+        self.assertTrue(max(map(len, shards)) - min(map(len, shards)) <= 1)
+        self.assertEqual(shards[1], shardlocales(list(reversed(self.locales)), 2, 4))
+        fam = [s for s in shards if 'en_GB' in s][0]
+        self.assertTrue(set(['en', 'en_001', 'en_AU']) <= set(fam))
+        fam = [s for s in shards if 'sr_Latn_ME' in s][0]
+        self.assertTrue(set(['sr', 'sr_Latn']) <= set(fam))
+
+    def test_families(self):
+        fams = families(['root', 'en', 'en_GB', 'es_AR', 'es_419', 'fr'])
+        self.assertEqual(fams, [['en', 'en_GB'], ['es_419', 'es_AR'], ['fr'], ['root']])
+
+    def test_mergetree(self):
+        for (d, f, t) in (('a', 'x/xx.xml', 'xx'), ('b', 'y/yy.xml', 'yy'), ('b', 'x/xx.xml', 'xx')):
+            fname = os.path.join(self.tmpdir, d, f)
+            if not os.path.exists(os.path.dirname(fname)):
+                os.makedirs(os.path.dirname(fname))
+            with open(fname, 'w') as fh:
+                fh.write(t)
+        out = os.path.join(self.tmpdir, 'out')
+        srcs = [os.path.join(self.tmpdir, d) for d in ('a', 'b')]
+        mergetree(srcs, out)
+        self.assertEqual(sorted(os.listdir(out)), ['x', 'y'])
+        with open(os.path.join(self.tmpdir, 'a', 'x', 'xx.xml'), 'w') as fh:
+            fh.write('zz')
+        self.assertRaises(ValueError, mergetree, srcs, out)
+        # a rebuild replaces what an earlier run left in out
+        mergetree(srcs[:1], out)
+        with open(os.path.join(out, 'x', 'xx.xml')) as fh:
+            self.assertEqual(fh.read(), 'zz')
+        with open(os.path.join(out, 'y', 'yy.xml')) as fh:
+            self.assertEqual(fh.read(), 'yy')
+
+    def test_mergeprivate(self):
+        names = []
+        for (i, ls) in enumerate((('yy', 'zz'), ('xx',))):
+            names.append(os.path.join(self.tmpdir, '{}.xml'.format(i)))
+            with open(names[-1], 'w') as fh:
+                fh.write('<private>' + ''.join('<locale id="{}"><contacts/></locale>'.format(l) for l in ls) + '</private>')
+        out = os.path.join(self.tmpdir, 'private.xml')
+        mergeprivate(names, out)
+        with open(out) as fh:
+            text = fh.read()
+        self.assertTrue(text.index('"xx"') < text.index('"yy"') < text.index('"zz"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
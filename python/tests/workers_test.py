@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+import os
+import sys
+import shutil
+import threading
+import tempfile
+import unittest
+
+try:
+    from sldr.workers import WorkerPool, MemoryMeter, writereport, rss
+except ImportError:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib')))
+    from sldr.workers import WorkerPool, MemoryMeter, writereport, rss
+
+kept = []
+
+def square(x):
+    return (x * x, os.getpid())
+
+def grow(x):
+    kept.append(' ' * (4 << 20))
+    return os.getpid()
+
+def fail(x):
+    if x == 3:
+        raise ValueError(x)
+    return x
+
+def unpicklable(x):
+    if x == 1:
+        raise ValueError(threading.Lock())
+    if x == 3:
+        return threading.Lock()
+    return x
+
+def leave(x):
+    os._exit(0)
+
+
+class WorkerTests(unittest.TestCase):
+
+    def test_map(self):
+        pool = WorkerPool(2)
+        res = pool.map(square, range(10))
+        self.assertEqual([r[0] for r in res], [x * x for x in range(10)])
+        self.assertEqual(pool.retired, 0)
+        self.assertEqual(pool.map(square, []), [])
+
+    def test_maxtasks(self):
+        pool = WorkerPool(2, maxtasks=3)
+        res = pool.map(square, range(10))
+        self.assertEqual([r[0] for r in res], [x * x for x in range(10)])
+        self.assertTrue(len(set(r[1] for r in res)) >= 4)
+        self.assertEqual(pool.retired, 3)
+
+    def test_maxmem(self):
+        pool = WorkerPool(1, maxmem=1 << 40)
+        self.assertEqual(len(set(pool.map(grow, range(4)))), 1)
+        pool = WorkerPool(1, maxmem=1)
+        self.assertEqual(len(set(pool.map(grow, range(4)))), 4)
+        self.assertEqual(pool.retired, 4)
+
+    def test_raise(self):
+        self.assertRaises(ValueError, WorkerPool(2).map, fail, range(6))
+
+    def test_unpicklable(self):
+        self.assertRaises(RuntimeError, WorkerPool(2).map, unpicklable, range(6))
+        self.assertRaises(RuntimeError, WorkerPool(2).map, unpicklable, [3])
+        self.assertRaises(RuntimeError, WorkerPool(2).map, leave, range(6))
+
+    def test_report(self):
+        meter = MemoryMeter()
+        meter.mark('read')
+        s = ' ' * (16 << 20)
+        alive = rss()
+        del s
+        meter.mark('flatten')
+        meter.mark('flatten')
+        self.assertEqual(list(meter.peaks), ['read', 'flatten'])
+        self.assertTrue(meter.peaks['flatten'] > alive - (1 << 20))      # the kernel counts pages lazily
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, 'report.tsv')
+            writereport(fname, [('fr', {'read': 1 << 20}), ('en', {'read': 3 << 20})])
+            with open(fname) as fh:
+                lines = fh.read().splitlines()
+            self.assertEqual(lines, ['locale\tphase\tpeak_mb', 'en\tread\t3.0', 'fr\tread\t1.0', '*\tread\t3.0'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()